@@ -1,22 +1,143 @@
 import asyncio
 import aiohttp
-from typing import List, Dict
+from typing import List, Dict, Optional
 import pandas as pd
+import logging
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    from json import loads as json_loads
+
+logger = logging.getLogger(__name__)
+
+CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+# Yahoo often rejects the default aiohttp User-Agent
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
 
 class AsyncDataFetcher:
     """Async data fetching as specified in docs/specification.md"""
-    
+
+    def __init__(self, max_connections: int = 100, max_connections_per_host: int = 10, timeout: float = 30):
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _session_open(self) -> bool:
+        """Whether the shared session is open and bound to the running event loop"""
+        return (
+            self._session is not None
+            and not self._session.closed
+            and self._session._loop is asyncio.get_running_loop()
+        )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Lazily create the shared, connection-pooled HTTP session for the running event loop"""
+        if not self._session_open():
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'User-Agent': USER_AGENT}
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     async def download_multiple_stocks(self, tickers: List[str], start_date, end_date) -> Dict[str, pd.Series]:
         """Download multiple stocks asynchronously"""
-        tasks = []
-        for ticker in tickers:
-            task = asyncio.create_task(self.async_download(ticker, start_date, end_date))
-            tasks.append(task)
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        return dict(zip(tickers, results))
-    
+        owns_session = not self._session_open()
+        self._get_session()
+        try:
+            if hasattr(asyncio, 'TaskGroup'):
+                async with asyncio.TaskGroup() as tg:
+                    tasks = {
+                        ticker: tg.create_task(self._download_or_error(ticker, start_date, end_date))
+                        for ticker in tickers
+                    }
+                return {ticker: task.result() for ticker, task in tasks.items()}
+
+            # Python < 3.11 has no TaskGroup
+            results = await asyncio.gather(
+                *(self.async_download(ticker, start_date, end_date) for ticker in tickers),
+                return_exceptions=True
+            )
+            return dict(zip(tickers, results))
+        finally:
+            if owns_session:
+                await self.close()
+
+    async def _download_or_error(self, ticker: str, start_date, end_date):
+        """Return the exception instead of raising so one bad ticker doesn't cancel the group"""
+        try:
+            return await self.async_download(ticker, start_date, end_date)
+        except Exception as e:
+            logger.warning(f"Async download failed for {ticker}: {e}")
+            return e
+
     async def async_download(self, ticker: str, start_date, end_date) -> pd.Series:
         """Download single stock data asynchronously"""
-        # Implementation for async download
-        pass
\ No newline at end of file
+        params = {
+            'period1': int(pd.Timestamp(start_date).timestamp()),
+            'period2': int(pd.Timestamp(end_date).timestamp()),
+            'interval': '1d',
+        }
+        # A call outside download_multiple_stocks or `async with` closes its own session
+        owns_session = not self._session_open()
+        session = self._get_session()
+        try:
+            async with session.get(CHART_URL.format(ticker=ticker), params=params) as resp:
+                resp.raise_for_status()
+                payload = json_loads(await resp.read())
+        finally:
+            if owns_session:
+                await self.close()
+
+        series = self._parse_chart(ticker, payload)
+        logger.debug("Downloaded %d data points for %s", len(series), ticker)
+        return series
+
+    @staticmethod
+    def _parse_chart(ticker: str, payload: Dict) -> pd.Series:
+        """Convert a Yahoo chart API response into an adjusted close price series"""
+        chart = payload.get('chart') or {}
+        if chart.get('error') or not chart.get('result'):
+            raise ValueError(f"No chart data returned for {ticker}: {chart.get('error')}")
+
+        result = chart['result'][0]
+        timestamps = result.get('timestamp') or []
+        indicators = result.get('indicators', {})
+        if indicators.get('adjclose'):
+            values = indicators['adjclose'][0]['adjclose']
+        else:
+            values = indicators['quote'][0]['close']
+
+        # Bars are stamped at the session open; keep the exchange's local date so
+        # tickers share one calendar (ASX and NZX open before midnight UTC)
+        index = pd.to_datetime(timestamps, unit='s', utc=True)
+        meta = result.get('meta') or {}
+        try:
+            index = index.tz_convert(meta['exchangeTimezoneName'])
+        except Exception:
+            index = index + pd.Timedelta(seconds=meta.get('gmtoffset') or 0)
+        index = index.tz_localize(None).normalize()
+        return pd.Series(values, index=index, name=ticker, dtype=float).dropna()
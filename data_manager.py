@@ -1,19 +1,28 @@
 import sqlite3
-from functools import lru_cache
-import pickle
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 import yfinance as yf
 import os
+import threading
+import weakref
 import logging
 
 logger = logging.getLogger(__name__)
 
 class DataManager:
+    MEMORY_CACHE_SIZE = 100
+    SQLITE_MAX_BATCH = 500  # Tickers per bulk cache query, under SQLite's bound-parameter limit
+    
     def __init__(self, cache_dir="cache", min_data_points=10):
         self.cache_dir = cache_dir
         self.db_path = f"{cache_dir}/stock_data.db"
         self.min_data_points = min_data_points
+        self._lock = threading.Lock()
+        self._pending = []  # Cache rows waiting for flush_cache
+        self._mem_cache = OrderedDict()  # (ticker, start, end) -> Series, in LRU order
+        self._index_pool = weakref.WeakValueDictionary()  # (len, first, last) -> date index shared by cached series
         self._init_db()
     
     def _init_db(self):
@@ -21,52 +30,210 @@ class DataManager:
         # Create cache directory if it doesn't exist
         os.makedirs(self.cache_dir, exist_ok=True)
         
+        # Keep one long-lived connection; access is serialized through self._lock
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        
+        # WAL + synchronous=NORMAL avoids an fsync on every cache write
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA cache_size=-65536")  # 64 MiB page cache
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._conn.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        
         # Initialize database
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock, self._conn as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(stock_cache)")}
+            if columns and 'data_values' not in columns:
+                # Drop caches written in the old pickled layout
+                conn.execute("DROP TABLE stock_cache")
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS stock_cache (
                     ticker TEXT,
                     start_date TEXT,
                     end_date TEXT,
-                    data BLOB,
+                    data_values BLOB,
+                    data_index BLOB,
                     cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     PRIMARY KEY (ticker, start_date, end_date)
                 )
             ''')
-            conn.commit()
     
-    @lru_cache(maxsize=100)
+    def close(self):
+        """Flush pending writes and close the cache database connection"""
+        self.flush_cache()
+        with self._lock:
+            self._conn.close()
+    
     def get_stock_data(self, ticker, start_date, end_date):
         """Check cache first, then fetch if needed"""
         # Validate date parameters
         if start_date >= end_date:
             raise ValueError(f"Start date ({start_date}) must be before end date ({end_date})")
         
+        key = (ticker, str(start_date), str(end_date))
+        data = self._memory_get(key)
+        if data is not None:
+            return data
+        
         cached_data = self._get_cached_data(ticker, start_date, end_date)
         if cached_data is not None:
-            return cached_data
+            return self._memory_put(key, cached_data)
         
         # Fetch and cache new data
         data = self._fetch_fresh_data(ticker, start_date, end_date)
         if data is not None:
             self._cache_data(ticker, data, start_date, end_date)
+            self.flush_cache()
+            data = self._memory_put(key, data)
         return data
     
+    def get_stock_arrays(self, ticker, start_date, end_date):
+        """Return (dates, prices) as datetime64[ns] and float64 arrays, or None if unavailable"""
+        data = self.get_stock_data(ticker, start_date, end_date)
+        if data is None:
+            return None
+        dates = pd.DatetimeIndex(data.index).as_unit('ns').to_numpy()
+        return dates, data.to_numpy(dtype=np.float64)
+    
+    def _memory_get(self, key):
+        """Return a series from the in-memory LRU, marking it most recently used"""
+        with self._lock:
+            data = self._mem_cache.get(key)
+            if data is not None:
+                self._mem_cache.move_to_end(key)
+            return data
+    
+    def _memory_put(self, key, data):
+        """Store a series in the in-memory LRU, evicting the least recently used entry.
+        
+        Returns the stored series, which may share its date index with other cached series.
+        """
+        with self._lock:
+            data = self._intern_index(data)
+            self._mem_cache[key] = data
+            self._mem_cache.move_to_end(key)
+            if len(self._mem_cache) > self.MEMORY_CACHE_SIZE:
+                self._mem_cache.popitem(last=False)
+            return data
+    
+    def _intern_index(self, data):
+        """Rebuild a series on an equal, already cached date index so tickers share one copy"""
+        index = data.index
+        if len(index) == 0:
+            return data
+        pool_key = (len(index), index[0], index[-1])
+        pooled = self._index_pool.get(pool_key)
+        if pooled is None:
+            self._index_pool[pool_key] = index
+            return data
+        if pooled is index or not pooled.equals(index):
+            return data
+        return pd.Series(data.to_numpy(), index=pooled, name=data.name, copy=False)
+    
+    # A row serves its exact range, or any range inside it that ends by the day it was
+    # cached; bars after that day did not exist yet when the row was downloaded
+    _COVERS_REQUEST = (
+        '((start_date=? AND end_date=?) OR '
+        '(start_date<=? AND end_date>=? AND date(cached_at)>=?))'
+    )
+    
+    @staticmethod
+    def _cover_params(start_date, end_date):
+        """Query parameters for _COVERS_REQUEST"""
+        start, end = str(start_date), str(end_date)
+        return start, end, start, end, end
+    
     def _get_cached_data(self, ticker, start_date, end_date):
-        """Retrieve cached data from SQLite database"""
+        """Retrieve cached data from SQLite database, slicing any cached range that covers the request"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute(
-                    'SELECT data FROM stock_cache WHERE ticker=? AND start_date=? AND end_date=?',
-                    (ticker, str(start_date), str(end_date))
-                )
-                row = cursor.fetchone()
-                if row:
-                    return pickle.loads(row[0])
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT data_values, data_index, start_date, end_date FROM stock_cache '
+                    f'WHERE ticker=? AND {self._COVERS_REQUEST} '
+                    'ORDER BY cached_at DESC LIMIT 1',
+                    (ticker, *self._cover_params(start_date, end_date))
+                ).fetchone()
+            if row:
+                return self._decode_cached_row(row, start_date, end_date)
         except Exception as e:
             logger.warning(f"Cache retrieval failed for {ticker}: {e}")
         return None
     
+    def _bulk_load_cached(self, tickers, start_date, end_date):
+        """Read cached series for many tickers with one query per SQLITE_MAX_BATCH tickers"""
+        results = {}
+        for start in range(0, len(tickers), self.SQLITE_MAX_BATCH):
+            chunk = tickers[start:start + self.SQLITE_MAX_BATCH]
+            try:
+                with self._lock:
+                    rows = self._conn.execute(
+                        'SELECT ticker, data_values, data_index, start_date, end_date FROM stock_cache '
+                        f'WHERE ticker IN ({",".join("?" * len(chunk))}) AND {self._COVERS_REQUEST} '
+                        'ORDER BY cached_at',
+                        (*chunk, *self._cover_params(start_date, end_date))
+                    ).fetchall()
+                # Rows come oldest first, so the newest covering range wins
+                for row in rows:
+                    results[row[0]] = row[1:]
+            except Exception as e:
+                logger.warning(f"Cache retrieval failed for {chunk}: {e}")
+        
+        decoded = {}
+        for ticker, row in results.items():
+            try:
+                decoded[ticker] = self._decode_cached_row(row, start_date, end_date)
+            except Exception as e:
+                logger.warning(f"Cache retrieval failed for {ticker}: {e}")
+        return decoded
+    
+    def _decode_cached_row(self, row, start_date, end_date):
+        """Decode a (values, index, start, end) cache row and slice it to the requested range"""
+        data = self._decode_series(row[0], row[1])
+        if row[2] == str(start_date) and row[3] == str(end_date):
+            return data
+        # yfinance treats the end date as exclusive
+        index = data.index
+        return data[(index >= pd.Timestamp(start_date)) & (index < pd.Timestamp(end_date))]
+    
+    def get_multiple_stocks(self, tickers, start_date, end_date, threads=None):
+        """Return {ticker: series} for all tickers, fetching cache misses in one batched download.
+        
+        threads is passed to yfinance: True/False, or the number of download threads.
+        """
+        if start_date >= end_date:
+            raise ValueError(f"Start date ({start_date}) must be before end date ({end_date})")
+        
+        results = {}
+        not_in_memory = []
+        for ticker in dict.fromkeys(tickers):
+            cached_data = self._memory_get((ticker, str(start_date), str(end_date)))
+            if cached_data is not None:
+                results[ticker] = cached_data
+            else:
+                not_in_memory.append(ticker)
+        
+        # Warm everything else from disk in bulk rather than one query per ticker
+        on_disk = self._bulk_load_cached(not_in_memory, start_date, end_date) if not_in_memory else {}
+        missing = []
+        for ticker in not_in_memory:
+            cached_data = on_disk.get(ticker)
+            if cached_data is not None:
+                results[ticker] = self._memory_put((ticker, str(start_date), str(end_date)), cached_data)
+            else:
+                missing.append(ticker)
+        
+        if missing:
+            fetched = self._fetch_fresh_batch(missing, start_date, end_date, threads)
+            for ticker in missing:
+                data = fetched.get(ticker)
+                if data is not None:
+                    self._cache_data(ticker, data, start_date, end_date)
+                    data = self._memory_put((ticker, str(start_date), str(end_date)), data)
+                results[ticker] = data
+            self.flush_cache()
+        
+        return results
+    
     def _fetch_fresh_data(self, ticker, start_date, end_date):
         """Fetch fresh data from Yahoo Finance"""
         try:
@@ -82,43 +249,113 @@ class DataManager:
                 logger.warning(f"No data returned for {ticker}")
                 return None
             
-            # Extract price series (handle both single and multi-ticker downloads)
-            if isinstance(data.columns, pd.MultiIndex):
-                if 'Close' in data.columns.get_level_values(0):
-                    # Handle multiple tickers or single ticker with MultiIndex
-                    close_data = data['Close']
-                    if isinstance(close_data, pd.DataFrame):
-                        price_series = close_data.iloc[:, 0]  # First ticker
-                    else:
-                        price_series = close_data  # Single ticker
-                else:
-                    price_series = data.iloc[:, 0]
-            else:
-                price_series = data['Close'] if 'Close' in data.columns else data.iloc[:, 0]
-            
-            # Clean the data
-            price_series = price_series.dropna()
-            
-            if len(price_series) < self.min_data_points:
-                logger.warning(f"Insufficient data for {ticker}: {len(price_series)} points")
-                return None
-            
-            logger.info(f"Successfully fetched {len(price_series)} data points for {ticker}")
-            return price_series
+            return self._clean_price_series(ticker, self._extract_price_series(data))
         
         except Exception as e:
             logger.error(f"Failed to fetch data for {ticker}: {e}")
             return None
     
+    def _fetch_fresh_batch(self, tickers, start_date, end_date, threads=None):
+        """Fetch several tickers from Yahoo Finance in a single request"""
+        if len(tickers) == 1:
+            return {tickers[0]: self._fetch_fresh_data(tickers[0], start_date, end_date)}
+        
+        try:
+            data = yf.download(
+                tickers,
+                start=start_date,
+                end=end_date,
+                progress=False,
+                auto_adjust=True,
+                group_by='ticker',
+                threads=True if threads is None else threads
+            )
+        except Exception as e:
+            logger.error(f"Failed to fetch batch data for {tickers}: {e}")
+            return {}
+        
+        if data.empty:
+            logger.warning(f"No data returned for {tickers}")
+            return {}
+        
+        results = {}
+        available = set(data.columns.get_level_values(0)) if isinstance(data.columns, pd.MultiIndex) else set()
+        for ticker in tickers:
+            if ticker not in available:
+                logger.warning(f"No data returned for {ticker}")
+                results[ticker] = None
+                continue
+            try:
+                price_series = self._extract_price_series(data[ticker])
+                results[ticker] = self._clean_price_series(ticker, price_series)
+            except Exception as e:
+                logger.error(f"Failed to extract data for {ticker}: {e}")
+                results[ticker] = None
+        return results
+    
+    def _extract_price_series(self, data):
+        """Extract the close price series (handle both single and multi-ticker downloads)"""
+        if isinstance(data.columns, pd.MultiIndex):
+            if 'Close' in data.columns.get_level_values(0):
+                # Handle multiple tickers or single ticker with MultiIndex
+                close_data = data['Close']
+                if isinstance(close_data, pd.DataFrame):
+                    return close_data.iloc[:, 0]  # First ticker
+                return close_data  # Single ticker
+            return data.iloc[:, 0]
+        return data['Close'] if 'Close' in data.columns else data.iloc[:, 0]
+    
+    def _clean_price_series(self, ticker, price_series):
+        """Drop missing values and reject series that are too short"""
+        prices = price_series.to_numpy(dtype=np.float64)
+        mask = ~np.isnan(prices)
+        if not mask.all():
+            price_series = pd.Series(prices[mask], index=price_series.index[mask], name=price_series.name)
+        
+        if len(price_series) < self.min_data_points:
+            logger.warning(f"Insufficient data for {ticker}: {len(price_series)} points")
+            return None
+        
+        logger.info(f"Successfully fetched {len(price_series)} data points for {ticker}")
+        return price_series
+    
     def _cache_data(self, ticker, data, start_date, end_date):
-        """Cache data in SQLite database"""
+        """Queue data for the SQLite cache; rows are written by flush_cache"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(
-                    'INSERT OR REPLACE INTO stock_cache (ticker, start_date, end_date, data) VALUES (?, ?, ?, ?)',
-                    (ticker, str(start_date), str(end_date), pickle.dumps(data))
-                )
-                conn.commit()
-                logger.debug(f"Cached data for {ticker}")
+            row = (ticker, str(start_date), str(end_date)) + self._encode_series(data)
         except Exception as e:
             logger.warning(f"Failed to cache data for {ticker}: {e}")
+            return
+        with self._lock:
+            self._pending.append(row)
+    
+    def flush_cache(self):
+        """Write all queued cache rows in a single transaction"""
+        with self._lock:
+            if not self._pending:
+                return
+            rows, self._pending = self._pending, []
+            try:
+                with self._conn as conn:
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO stock_cache (ticker, start_date, end_date, data_values, data_index) VALUES (?, ?, ?, ?, ?)',
+                        rows
+                    )
+                logger.debug(f"Cached data for {len(rows)} tickers")
+            except Exception as e:
+                logger.warning(f"Failed to cache data for {[row[0] for row in rows]}: {e}")
+    
+    @staticmethod
+    def _encode_series(data):
+        """Serialize a price series as raw float64 values and int64 nanosecond timestamps"""
+        values = data.to_numpy(dtype=np.float64).tobytes()
+        index = pd.DatetimeIndex(data.index).as_unit('ns').asi8.tobytes()
+        return values, index
+    
+    @staticmethod
+    def _decode_series(values, index):
+        """Rebuild a price series from the raw cache blobs without copying the values"""
+        return pd.Series(
+            np.frombuffer(values, dtype=np.float64),
+            index=pd.to_datetime(np.frombuffer(index, dtype=np.int64), unit='ns')
+        )
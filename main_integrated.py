@@ -1,6 +1,15 @@
+import asyncio
 import streamlit as st
 from streamlit_app import StreamlitApp
 import logging
+
+# Use the libuv-based event loop for the async fetcher when it is installed
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1,183 +1,438 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional, Union
 import numpy as np
 import pandas as pd
+import threading
 import logging
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - numba is an optional speedup
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in so the kernel below stays importable without numba"""
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 logger = logging.getLogger(__name__)
 
+Returns = Union[pd.Series, np.ndarray]
+
+METRIC_NAMES = ('Information Ratio', 'Sharpe Ratio', 'Beta', 'Alpha', 'Relative Strength', 'Total Return')
+
+TRADING_DAYS = 252
+SQRT_TRADING_DAYS = float(np.sqrt(TRADING_DAYS))
+
+@njit(cache=True)
+def _return_moments_jit(stock: np.ndarray, bench: np.ndarray) -> tuple:
+    """Single-pass accumulation of the moments every built-in metric needs.
+
+    Means, second moments and the stock/benchmark co-moment use Welford
+    updates, so constant series give an exact zero variance.
+    """
+    n = stock.shape[0]
+    mean_s = 0.0
+    mean_b = 0.0
+    mean_e = 0.0
+    m2_s = 0.0
+    m2_b = 0.0
+    m2_e = 0.0
+    c_sb = 0.0
+    cum_s = 1.0
+    cum_b = 1.0
+    finite_s = True
+    finite_b = True
+    for i in range(n):
+        s = stock[i]
+        b = bench[i]
+        e = s - b
+        if not np.isfinite(s):
+            finite_s = False
+        if not np.isfinite(b):
+            finite_b = False
+        cum_s *= 1.0 + s
+        cum_b *= 1.0 + b
+        k = i + 1.0
+        ds = s - mean_s
+        db = b - mean_b
+        de = e - mean_e
+        mean_s += ds / k
+        mean_b += db / k
+        mean_e += de / k
+        m2_s += ds * (s - mean_s)
+        m2_b += db * (b - mean_b)
+        m2_e += de * (e - mean_e)
+        c_sb += ds * (b - mean_b)
+    return mean_s, mean_b, mean_e, m2_s, m2_b, m2_e, c_sb, cum_s, cum_b, finite_s, finite_b
+
+def _return_moments_numpy(stock: np.ndarray, bench: np.ndarray) -> tuple:
+    """NumPy equivalent of _return_moments_jit for environments without numba"""
+    excess = stock - bench
+    mean_s = stock.mean()
+    mean_b = bench.mean()
+    mean_e = excess.mean()
+    # Constant series must give an exact zero variance, as with the Welford kernel
+    centered_s = stock - mean_s if np.ptp(stock) else np.zeros_like(stock)
+    centered_b = bench - mean_b if np.ptp(bench) else np.zeros_like(bench)
+    centered_e = excess - mean_e if np.ptp(excess) else np.zeros_like(excess)
+    return (
+        mean_s, mean_b, mean_e,
+        centered_s @ centered_s, centered_b @ centered_b, centered_e @ centered_e, centered_s @ centered_b,
+        np.prod(1.0 + stock), np.prod(1.0 + bench),
+        bool(np.isfinite(stock).all()), bool(np.isfinite(bench).all()),
+    )
+
+def _batched_moments_numpy(returns_matrix: np.ndarray, benchmark_returns: np.ndarray) -> tuple:
+    """NumPy equivalent of metrics_numba.batched_moments for environments without numba"""
+    # Keep float32 matrices in float32, but reduce in float64
+    excess = returns_matrix - benchmark_returns.astype(returns_matrix.dtype)
+    mean_s = returns_matrix.mean(axis=1, dtype=np.float64)
+    mean_b = benchmark_returns.mean()
+    mean_e = excess.mean(axis=1, dtype=np.float64)
+    # Constant rows must give an exact zero variance, as with the Welford kernel
+    centered_s = np.where((np.ptp(returns_matrix, axis=1) != 0)[:, None], returns_matrix - mean_s[:, None], 0.0)
+    centered_e = np.where((np.ptp(excess, axis=1) != 0)[:, None], excess - mean_e[:, None], 0.0)
+    centered_b = benchmark_returns - mean_b if np.ptp(benchmark_returns) else np.zeros_like(benchmark_returns)
+    return (
+        mean_s, mean_e,
+        np.einsum('ij,ij->i', centered_s, centered_s, dtype=np.float64),
+        np.einsum('ij,ij->i', centered_e, centered_e, dtype=np.float64),
+        np.einsum('ij,j->i', centered_s, centered_b, dtype=np.float64),
+        np.prod(1.0 + returns_matrix, axis=1, dtype=np.float64), np.isfinite(returns_matrix).all(axis=1),
+    )
+
+_return_moments = _return_moments_jit if NUMBA_AVAILABLE else _return_moments_numpy
+
+if NUMBA_AVAILABLE:
+    from metrics_numba import batched_moments as _batched_moments_jit
+
+    # Streamlit sessions run in separate threads, and numba's default workqueue
+    # threading layer aborts the process if a parallel kernel is entered concurrently
+    _batched_moments_lock = threading.Lock()
+
+    def _batched_moments(returns_matrix: np.ndarray, benchmark_returns: np.ndarray) -> tuple:
+        """Serialized call into the prange kernel, which already uses every core"""
+        with _batched_moments_lock:
+            return _batched_moments_jit(returns_matrix, benchmark_returns)
+
+    # Compile (or load from the on-disk cache) once at import time
+    _return_moments(np.zeros(2), np.zeros(2))
+    _batched_moments(np.zeros((1, 2)), np.zeros(2))
+else:
+    _batched_moments = _batched_moments_numpy
+
+@dataclass(frozen=True)
+class ReturnStats:
+    """Summary statistics of a stock/benchmark return pair, shared by all calculators"""
+    n: int
+    mean_s: float
+    mean_b: float
+    mean_excess: float
+    var_s: float
+    var_b: float
+    var_excess: float
+    cov_sb: float
+    beta: float
+    cum_s: float
+    cum_b: float
+    finite_s: bool
+    finite_b: bool
+
+    @classmethod
+    def from_returns(cls, stock_returns: Returns, benchmark_returns: Returns) -> 'ReturnStats':
+        """Compute all statistics in one pass over the two return arrays"""
+        s = np.ascontiguousarray(stock_returns, dtype=np.float64)
+        b = np.ascontiguousarray(benchmark_returns, dtype=np.float64)
+        if s.shape != b.shape:
+            raise ValueError(f"Stock and benchmark returns differ in length: {len(s)} != {len(b)}")
+
+        n = len(s)
+        if n == 0:
+            return cls(0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, True, True)
+
+        mean_s, mean_b, mean_e, m2_s, m2_b, m2_e, c_sb, cum_s, cum_b, finite_s, finite_b = _return_moments(s, b)
+        ddof = n - 1 if n > 1 else np.nan
+
+        # Beta is needed by both BetaCalculator and AlphaCalculator, so derive it once here
+        var_b = m2_b / ddof
+        cov_sb = c_sb / ddof
+        if n < 2 or not (finite_s and finite_b) or var_b == 0 or np.isnan(var_b) or np.isnan(cov_sb):
+            beta = np.nan
+        else:
+            beta = cov_sb / var_b
+
+        return cls(
+            n=n,
+            mean_s=float(mean_s),
+            mean_b=float(mean_b),
+            mean_excess=float(mean_e),
+            var_s=float(m2_s / ddof),
+            var_b=float(var_b),
+            var_excess=float(m2_e / ddof),
+            cov_sb=float(cov_sb),
+            beta=float(beta),
+            cum_s=float(cum_s),
+            cum_b=float(cum_b),
+            finite_s=bool(finite_s),
+            finite_b=bool(finite_b),
+        )
+
+@dataclass(frozen=True)
+class BenchmarkStats:
+    """Benchmark-only statistics, shared by every ticker screened against the benchmark"""
+    returns: np.ndarray
+    n: int
+    mean: float
+    var: float
+    cum: float
+    finite: bool
+
+    @classmethod
+    def from_returns(cls, benchmark_returns: Returns) -> 'BenchmarkStats':
+        """Compute the benchmark's moments in one pass"""
+        b = np.ascontiguousarray(benchmark_returns, dtype=np.float64)
+        n = len(b)
+        if n == 0:
+            return cls(b, 0, np.nan, np.nan, np.nan, True)
+        mean_b, _, _, _, m2_b, _, _, _, cum_b, _, finite_b = _return_moments(b, b)
+        return cls(
+            returns=b,
+            n=n,
+            mean=float(mean_b),
+            var=float(m2_b / (n - 1)) if n > 1 else np.nan,
+            cum=float(cum_b),
+            finite=bool(finite_b),
+        )
+
 class MetricCalculator(ABC):
     @abstractmethod
-    def calculate(self, stock_returns: pd.Series, benchmark_returns: pd.Series) -> float:
+    def calculate(self, stock_returns: Returns, benchmark_returns: Returns) -> float:
         pass
 
-class InformationRatio(MetricCalculator):
-    def calculate(self, stock_returns: pd.Series, benchmark_returns: pd.Series) -> float:
+class StatsMetricCalculator(MetricCalculator):
+    """Metric expressed as a formula over precomputed ReturnStats"""
+
+    def calculate(self, stock_returns: Returns, benchmark_returns: Returns) -> float:
         try:
-            if len(stock_returns) < 2 or len(benchmark_returns) < 2:
-                return np.nan
-                
-            excess_returns = stock_returns - benchmark_returns
-            
-            # Check for infinite or NaN values
-            if not np.isfinite(excess_returns).all():
-                return np.nan
-                
-            excess_std = excess_returns.std()
-            if excess_std == 0 or np.isnan(excess_std):
-                return np.nan
-                
-            return excess_returns.mean() / excess_std
+            return self.from_stats(ReturnStats.from_returns(stock_returns, benchmark_returns))
         except Exception:
             return np.nan
 
-class SharpeRatio(MetricCalculator):
-    def __init__(self, risk_free_rate: float = 0.03):
-        self.risk_free_rate = risk_free_rate / 252
-    
-    def calculate(self, stock_returns: pd.Series, benchmark_returns: pd.Series) -> float:
-        try:
-            if len(stock_returns) < 2:
-                return np.nan
-                
-            # Check for infinite or NaN values
-            if not np.isfinite(stock_returns).all():
-                return np.nan
-                
-            excess_returns = stock_returns - self.risk_free_rate
-            stock_std = stock_returns.std()
-            
-            if stock_std == 0 or np.isnan(stock_std):
-                return np.nan
-                
-            return (excess_returns.mean() / stock_std) * np.sqrt(252)
-        except Exception:
+    @abstractmethod
+    def from_stats(self, stats: ReturnStats) -> float:
+        pass
+
+class InformationRatio(StatsMetricCalculator):
+    def from_stats(self, stats: ReturnStats) -> float:
+        if stats.n < 2 or not (stats.finite_s and stats.finite_b):
             return np.nan
+        excess_std = np.sqrt(stats.var_excess)
+        if excess_std == 0 or np.isnan(excess_std):
+            return np.nan
+        return float(stats.mean_excess / excess_std)
 
-class BetaCalculator(MetricCalculator):
-    def calculate(self, stock_returns: pd.Series, benchmark_returns: pd.Series) -> float:
-        try:
-            if len(stock_returns) < 2 or len(benchmark_returns) < 2:
-                return np.nan
-            
-            # Check for infinite or NaN values
-            if not (np.isfinite(stock_returns).all() and np.isfinite(benchmark_returns).all()):
-                return np.nan
-            
-            covariance = np.cov(stock_returns, benchmark_returns)[0, 1]
-            benchmark_variance = benchmark_returns.var()
-            
-            if benchmark_variance == 0 or np.isnan(benchmark_variance) or np.isnan(covariance):
-                return np.nan
-                
-            return covariance / benchmark_variance
-        except Exception:
+class SharpeRatio(StatsMetricCalculator):
+    def __init__(self, risk_free_rate: float = 0.03):
+        self.risk_free_rate = risk_free_rate / TRADING_DAYS
+
+    def from_stats(self, stats: ReturnStats) -> float:
+        if stats.n < 2 or not stats.finite_s:
+            return np.nan
+        stock_std = np.sqrt(stats.var_s)
+        if stock_std == 0 or np.isnan(stock_std):
             return np.nan
+        return float((stats.mean_s - self.risk_free_rate) / stock_std * SQRT_TRADING_DAYS)
+
+class BetaCalculator(StatsMetricCalculator):
+    def from_stats(self, stats: ReturnStats) -> float:
+        return stats.beta
 
-class AlphaCalculator(MetricCalculator):
+class AlphaCalculator(StatsMetricCalculator):
     def __init__(self, risk_free_rate: float = 0.03):
-        self.risk_free_rate = risk_free_rate / 252
-    
-    def calculate(self, stock_returns: pd.Series, benchmark_returns: pd.Series) -> float:
-        try:
-            if len(stock_returns) < 2 or len(benchmark_returns) < 2:
-                return np.nan
-                
-            # Check for infinite or NaN values
-            if not (np.isfinite(stock_returns).all() and np.isfinite(benchmark_returns).all()):
-                return np.nan
-                
-            beta_calc = BetaCalculator()
-            beta = beta_calc.calculate(stock_returns, benchmark_returns)
-            
-            if np.isnan(beta):
-                return np.nan
-            
-            expected_return = self.risk_free_rate + beta * (benchmark_returns.mean() - self.risk_free_rate)
-            alpha = stock_returns.mean() - expected_return
-            return alpha * 252  # Annualized
-        except Exception:
+        self.risk_free_rate = risk_free_rate / TRADING_DAYS
+
+    def from_stats(self, stats: ReturnStats) -> float:
+        if np.isnan(stats.beta):
             return np.nan
+        expected_return = self.risk_free_rate + stats.beta * (stats.mean_b - self.risk_free_rate)
+        return (stats.mean_s - expected_return) * TRADING_DAYS  # Annualized
 
 class MetricsEngine:
-    def __init__(self):
+    def __init__(self, risk_free_rate: float = 0.03, precision: str = 'float64'):
+        if precision not in ('float32', 'float64'):
+            raise ValueError(f"Unsupported precision: {precision}")
+        # Storage dtype for batched returns matrices; moments always accumulate in float64
+        self.precision = np.dtype(precision)
         self.calculators = {
             'Information Ratio': InformationRatio(),
-            'Sharpe Ratio': SharpeRatio(),
+            'Sharpe Ratio': SharpeRatio(risk_free_rate),
             'Beta': BetaCalculator(),
-            'Alpha': AlphaCalculator(),
+            'Alpha': AlphaCalculator(risk_free_rate),
         }
-    
-    def calculate_all_metrics(self, stock_returns: pd.Series, benchmark_returns: pd.Series) -> dict:
-        logger.debug(f"MetricsEngine: Starting calculation with {len(stock_returns)} stock returns and {len(benchmark_returns)} benchmark returns")
-        results = {}
-        
+        # Built-ins are evaluated by _fast_builtin; only other entries go through the dispatch loop
+        self._builtin = dict(self.calculators)
+        self.benchmark: Optional[BenchmarkStats] = None
+
+    def calculate_all_metrics(self, stock_returns: Returns, benchmark_returns: Returns) -> dict:
+        logger.debug("MetricsEngine: Starting calculation with %d stock returns and %d benchmark returns",
+                     len(stock_returns), len(benchmark_returns))
+        debug = logger.isEnabledFor(logging.DEBUG)
+
         # Validate input data
         if len(stock_returns) == 0 or len(benchmark_returns) == 0:
             logger.warning("Empty returns data provided")
-            return {name: np.nan for name in ['Information Ratio', 'Sharpe Ratio', 'Beta', 'Alpha', 'Relative Strength', 'Total Return']}
-        
+            return {name: np.nan for name in METRIC_NAMES}
+
+        # Compute the shared statistics once for every calculator
+        try:
+            stats = ReturnStats.from_returns(stock_returns, benchmark_returns)
+        except Exception as e:
+            logger.error(f"Error computing return statistics: {e}", exc_info=True)
+            stats = None
+
         # Check for invalid values
-        if not np.isfinite(stock_returns).all():
+        if stats is not None and not stats.finite_s:
             logger.warning("Stock returns contain invalid values (inf, -inf, or NaN)")
-        
-        if not np.isfinite(benchmark_returns).all():
+
+        if stats is not None and not stats.finite_b:
             logger.warning("Benchmark returns contain invalid values (inf, -inf, or NaN)")
-        
+
+        results = self._fast_builtin(stock_returns, benchmark_returns, stats)
+
+        # Slow path: calculators added or replaced through add_calculator
         for name, calculator in self.calculators.items():
+            if self._builtin.get(name) is calculator:
+                continue
             try:
-                logger.debug(f"Calculating {name}")
-                result = calculator.calculate(stock_returns, benchmark_returns)
+                if isinstance(calculator, StatsMetricCalculator):
+                    result = calculator.from_stats(stats) if stats is not None else np.nan
+                else:
+                    result = calculator.calculate(stock_returns, benchmark_returns)
                 results[name] = result
-                logger.debug(f"{name} calculated: {result}")
+                if debug:
+                    logger.debug("%s calculated: %s", name, result)
             except Exception as e:
                 logger.error(f"Error calculating {name}: {e}", exc_info=True)
                 results[name] = np.nan
-        
-        # Add additional metrics
-        try:
-            logger.debug("Calculating Relative Strength")
-            results['Relative Strength'] = self._calculate_relative_strength(stock_returns, benchmark_returns)
-            logger.debug(f"Relative Strength calculated: {results['Relative Strength']}")
-        except Exception as e:
-            logger.error(f"Error calculating Relative Strength: {e}", exc_info=True)
-            results['Relative Strength'] = np.nan
-        
-        try:
-            logger.debug("Calculating Total Return")
-            if len(stock_returns) > 0:
-                results['Total Return'] = (1 + stock_returns).cumprod().iloc[-1] - 1
-            else:
-                results['Total Return'] = np.nan
-            logger.debug(f"Total Return calculated: {results['Total Return']}")
-        except Exception as e:
-            logger.error(f"Error calculating Total Return: {e}", exc_info=True)
-            results['Total Return'] = np.nan
-        
-        logger.debug(f"All metrics calculated: {results}")
+
+        if debug:
+            logger.debug("All metrics calculated: %s", results)
         return results
-    
+
+    def _fast_builtin(self, stock_returns: Returns, benchmark_returns: Returns,
+                      stats: Optional[ReturnStats]) -> dict:
+        """Evaluate every built-in metric straight from the shared statistics"""
+        if stats is None:
+            return {name: np.nan for name in METRIC_NAMES}
+        builtin = self._builtin
+        return {
+            'Information Ratio': builtin['Information Ratio'].from_stats(stats),
+            'Sharpe Ratio': builtin['Sharpe Ratio'].from_stats(stats),
+            'Beta': builtin['Beta'].from_stats(stats),
+            'Alpha': builtin['Alpha'].from_stats(stats),
+            'Relative Strength': self._calculate_relative_strength(stock_returns, benchmark_returns, stats),
+            'Total Return': stats.cum_s - 1,
+        }
+
+    def set_benchmark(self, benchmark_returns: Returns) -> BenchmarkStats:
+        """Precompute benchmark statistics for subsequent batched calls"""
+        self.benchmark = BenchmarkStats.from_returns(benchmark_returns)
+        return self.benchmark
+
+    def calculate_all_metrics_batched(self, returns_matrix: np.ndarray,
+                                      benchmark_returns: Optional[Returns] = None) -> dict:
+        """Metrics for many tickers at once, one row of returns_matrix per ticker.
+
+        Every row must be aligned with benchmark_returns, which defaults to the
+        benchmark passed to set_benchmark. Returns a dict of per-row metric
+        arrays matching calculate_all_metrics row by row.
+        """
+        if benchmark_returns is not None:
+            bench = BenchmarkStats.from_returns(benchmark_returns)
+        elif self.benchmark is not None:
+            bench = self.benchmark
+        else:
+            raise ValueError("No benchmark returns given and no benchmark set")
+        R = np.asarray(returns_matrix, dtype=self.precision)
+        b = bench.returns
+        if R.ndim != 2 or R.shape[1] != b.shape[0]:
+            raise ValueError(f"Returns matrix shape {R.shape} does not match {len(b)} benchmark returns")
+        if R.strides[1] != R.itemsize:
+            # Column views of a wider matrix are fine as long as each row is contiguous
+            R = np.ascontiguousarray(R)
+
+        n_tickers, n = R.shape
+        if n == 0:
+            logger.warning("Empty returns data provided")
+            return {name: np.full(n_tickers, np.nan) for name in METRIC_NAMES}
+
+        rf = self._builtin['Sharpe Ratio'].risk_free_rate
+        ddof = n - 1 if n > 1 else np.nan
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            mean_s, mean_e, m2_s, m2_e, c_sb, cum_s, finite_s = _batched_moments(R, b)
+            mean_b, var_b, cum_b, finite_b = bench.mean, bench.var, bench.cum, bench.finite
+            cov_sb = c_sb / ddof
+            std_e = np.sqrt(m2_e / ddof)
+            std_s = np.sqrt(m2_s / ddof)
+            ir = np.where(finite_s & finite_b & (std_e != 0), mean_e / std_e, np.nan)
+            sharpe = np.where(finite_s & (std_s != 0), (mean_s - rf) / std_s * SQRT_TRADING_DAYS, np.nan)
+            # Masks instead of per-row branches; NaN variances fail the > 0 comparison
+            beta = np.where(finite_s & finite_b & (var_b > 0) & ~np.isnan(cov_sb), cov_sb / var_b, np.nan)
+            alpha = (mean_s - (rf + beta * (mean_b - rf))) * TRADING_DAYS
+            relative_strength = np.where(cum_b != 0, cum_s / cum_b, np.nan)
+
+        results = {
+            'Information Ratio': ir,
+            'Sharpe Ratio': sharpe,
+            'Beta': beta,
+            'Alpha': alpha,
+            'Relative Strength': relative_strength,
+            'Total Return': cum_s - 1,
+        }
+
+        # Calculators added or replaced through add_calculator run row by row
+        for name, calculator in self.calculators.items():
+            if self._builtin.get(name) is calculator:
+                continue
+            values = np.full(n_tickers, np.nan)
+            for i in range(n_tickers):
+                try:
+                    values[i] = calculator.calculate(R[i], b)
+                except Exception as e:
+                    logger.error(f"Error calculating {name}: {e}", exc_info=True)
+            results[name] = values
+
+        return results
+
     def add_calculator(self, name: str, calculator: MetricCalculator) -> None:
         """Add a new metric calculator"""
         self.calculators[name] = calculator
-    
-    def _calculate_relative_strength(self, stock_returns: pd.Series, benchmark_returns: pd.Series) -> float:
+
+    def _calculate_relative_strength(self, stock_returns: Returns, benchmark_returns: Returns,
+                                     stats: Optional[ReturnStats] = None) -> float:
         """Calculate relative strength ratio"""
         logger.debug("Calculating relative strength components")
         try:
             if len(stock_returns) == 0 or len(benchmark_returns) == 0:
                 logger.warning("Empty returns data for relative strength calculation")
                 return np.nan
-            
-            stock_cumulative = (1 + stock_returns).cumprod().iloc[-1]
-            benchmark_cumulative = (1 + benchmark_returns).cumprod().iloc[-1]
-            logger.debug(f"Stock cumulative: {stock_cumulative}, Benchmark cumulative: {benchmark_cumulative}")
-            
+
+            if stats is None:
+                stats = ReturnStats.from_returns(stock_returns, benchmark_returns)
+            stock_cumulative = stats.cum_s
+            benchmark_cumulative = stats.cum_b
+            logger.debug("Stock cumulative: %s, Benchmark cumulative: %s", stock_cumulative, benchmark_cumulative)
+
             if benchmark_cumulative == 0 or pd.isna(benchmark_cumulative):
                 logger.warning("Benchmark cumulative return is zero or NaN")
                 return np.nan
-            
+
             result = stock_cumulative / benchmark_cumulative
-            logger.debug(f"Relative strength result: {result}")
+            logger.debug("Relative strength result: %s", result)
             return result
         except Exception as e:
             logger.error(f"Error in _calculate_relative_strength: {e}", exc_info=True)
@@ -0,0 +1,52 @@
+from numba import njit, prange
+import numpy as np
+
+@njit(parallel=True, cache=True)
+def batched_moments(returns_matrix: np.ndarray, benchmark_returns: np.ndarray) -> tuple:
+    """Per-row moments of a (tickers x days) returns matrix against one benchmark.
+
+    Rows are spread over threads with prange; each row is a single Welford
+    pass, so constant rows give an exact zero variance.
+    """
+    n_rows, n = returns_matrix.shape
+    mean_s = np.empty(n_rows)
+    mean_e = np.empty(n_rows)
+    m2_s = np.empty(n_rows)
+    m2_e = np.empty(n_rows)
+    c_sb = np.empty(n_rows)
+    cum_s = np.empty(n_rows)
+    finite_s = np.empty(n_rows, dtype=np.bool_)
+    for row in prange(n_rows):
+        ms = 0.0
+        mb = 0.0
+        me = 0.0
+        vs = 0.0
+        ve = 0.0
+        csb = 0.0
+        cum = 1.0
+        finite = True
+        for i in range(n):
+            s = returns_matrix[row, i]
+            b = benchmark_returns[i]
+            e = s - b
+            if not np.isfinite(s):
+                finite = False
+            cum *= 1.0 + s
+            k = i + 1.0
+            ds = s - ms
+            db = b - mb
+            de = e - me
+            ms += ds / k
+            mb += db / k
+            me += de / k
+            vs += ds * (s - ms)
+            ve += de * (e - me)
+            csb += ds * (b - mb)
+        mean_s[row] = ms
+        mean_e[row] = me
+        m2_s[row] = vs
+        m2_e[row] = ve
+        c_sb[row] = csb
+        cum_s[row] = cum
+        finite_s[row] = finite
+    return mean_s, mean_e, m2_s, m2_e, c_sb, cum_s, finite_s
@@ -1,44 +1,70 @@
-import multiprocessing as mp
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from metrics import MetricsEngine
+import logging
+
+logger = logging.getLogger(__name__)
+
+def window_returns(stock_data_dict: Dict[str, pd.Series], benchmark_data: pd.Series,
+                   lookback: int) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Returns over the benchmark's last lookback days, one matrix row per ticker.
+
+    The matrix is C-contiguous so the per-row reductions read memory
+    sequentially. Rows for tickers that missed a day in the window contain NaN.
+    """
+    tickers = [ticker for ticker, data in stock_data_dict.items() if data is not None]
+    window = benchmark_data.index[-lookback - 1:]
+    prices = np.vstack([
+        stock_data_dict[ticker].reindex(window).to_numpy(dtype=np.float64) for ticker in tickers
+    ]) if tickers else np.empty((0, len(window)))
+    benchmark_prices = benchmark_data.to_numpy(dtype=np.float64)[-lookback - 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.require(np.diff(prices, axis=1) / prices[:, :-1], dtype=np.float64, requirements='C')
+        benchmark_returns = np.diff(benchmark_prices) / benchmark_prices[:-1]
+    return tickers, returns, benchmark_returns
 
 class ParallelProcessor:
     """Parallel processing for metric calculations as specified in docs/specification.md"""
-    
-    def parallel_metric_calculation(self, stock_data_dict: Dict[str, pd.Series], 
-                                  benchmark_data: pd.Series, lookback: int) -> Dict[str, Dict]:
-        """Use multiprocessing for metric calculations"""
-        with mp.Pool(processes=mp.cpu_count()) as pool:
-            args = [(ticker, data, benchmark_data, lookback) 
-                    for ticker, data in stock_data_dict.items() if data is not None]
-            results = pool.starmap(self.calculate_metrics_wrapper, args)
-        
-        return {ticker: result for (ticker, _), result in zip(stock_data_dict.items(), results) if result}
-    
-    @staticmethod
-    def calculate_metrics_wrapper(args: Tuple) -> Dict:
-        """Wrapper function for multiprocessing"""
-        ticker, stock_data, benchmark_data, lookback = args
-        
-        try:
-            # Calculate returns
-            stock_returns = stock_data.pct_change().dropna()
-            benchmark_returns = benchmark_data.pct_change().dropna()
-            
-            # Align data
-            aligned_data = pd.concat([stock_returns, benchmark_returns], axis=1).dropna()
-            if len(aligned_data) < lookback:
-                return None
-            
-            # Use recent data
-            recent_stock = aligned_data.iloc[:, 0].tail(lookback)
-            recent_benchmark = aligned_data.iloc[:, 1].tail(lookback)
-            
-            # Calculate metrics
-            metrics_engine = MetricsEngine()
-            return metrics_engine.calculate_all_metrics(recent_stock, recent_benchmark)
-            
-        except Exception as e:
-            print(f"Error calculating metrics for {ticker}: {e}")
-            return None
\ No newline at end of file
+
+    # Rows per batched call, bounding the temporaries of the NumPy fallback
+    CHUNK_ROWS = 256
+
+    def __init__(self):
+        self.metrics_engine = MetricsEngine()
+
+    def parallel_metric_calculation(self, stock_data_dict: Dict[str, pd.Series],
+                                  benchmark_data: pd.Series, lookback: int,
+                                  metrics_engine: Optional[MetricsEngine] = None) -> Dict[str, Dict]:
+        """Compute metrics as batched NumPy chunks.
+
+        Only tickers that traded on every day of the window are returned; the
+        caller handles tickers with gaps. metrics_engine defaults to the
+        processor's own engine.
+        """
+        engine = metrics_engine or self.metrics_engine
+        if len(benchmark_data) < lookback + 1:
+            return {}
+        tickers, returns, benchmark_returns = window_returns(stock_data_dict, benchmark_data, lookback)
+        if not tickers:
+            return {}
+
+        complete = ~np.isnan(returns).any(axis=1) & ~np.isnan(benchmark_returns).any()
+        results = {}
+        complete_tickers = [t for t, ok in zip(tickers, complete) if ok]
+        complete_returns = returns[complete]
+        chunks = [
+            (complete_tickers[start:start + self.CHUNK_ROWS], complete_returns[start:start + self.CHUNK_ROWS])
+            for start in range(0, len(complete_tickers), self.CHUNK_ROWS)
+        ]
+
+        # Benchmark statistics are computed once and shared by every chunk
+        engine.set_benchmark(benchmark_returns)
+
+        for chunk_tickers, chunk_returns in chunks:
+            batched = engine.calculate_all_metrics_batched(chunk_returns)
+            results.update({
+                ticker: {name: float(values[i]) for name, values in batched.items()}
+                for i, ticker in enumerate(chunk_tickers)
+            })
+        return results
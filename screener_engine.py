@@ -1,11 +1,13 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from data_manager import DataManager
 from metrics import MetricsEngine
 from validators import DataValidator
 from config import ScreenerConfig
 from async_fetcher import AsyncDataFetcher
+from parallel_processor import ParallelProcessor, window_returns
 import asyncio
 import logging
 
@@ -14,87 +16,232 @@ logger = logging.getLogger(__name__)
 class ScreenerEngine:
     """Main screener engine as specified in docs/specification.md"""
     
+    # Below this many tickers one batched call beats chunking the work across threads
+    PARALLEL_MIN_TICKERS = 200
+    
     def __init__(self, config: ScreenerConfig):
         self.config = config
         self.data_manager = DataManager()
         self.metrics_engine = MetricsEngine()
         self.validator = DataValidator()
         self.async_fetcher = AsyncDataFetcher()
+        self.parallel_processor = ParallelProcessor()
+        self.warnings: List[str] = []  # Per-ticker warnings from the last screening run
     
-    def screen_stocks(self, tickers: List[str], benchmark: str, lookback: int) -> pd.DataFrame:
-        """Run screening analysis on stocks"""
-        results = []
-        
-        # Calculate date range with larger buffer for trading days
-        end_date = datetime.now()
+    def date_range(self, lookback: int) -> Tuple[date, date]:
+        """Download window for a lookback, at day granularity so cache keys are stable"""
+        # End is exclusive for yfinance, so use tomorrow to include today's bar
+        end_date = date.today() + timedelta(days=1)
         # Use 1.5x multiplier to account for weekends, holidays, and alignment losses
         buffer_days = max(100, int(lookback * 1.5))
         start_date = end_date - timedelta(days=lookback + buffer_days)
+        return start_date, end_date
+    
+    def screen_stocks(self, tickers: List[str], benchmark: str, lookback: int,
+                      price_data: Optional[Dict[str, pd.Series]] = None,
+                      threads: Optional[Union[bool, int]] = None,
+                      top_k: Optional[int] = None) -> pd.DataFrame:
+        """Run screening analysis on stocks, optionally on already fetched prices.
+        
+        threads sets how many parallel download threads yfinance uses (default: its own choice).
+        top_k keeps only the best top_k tickers by Information Ratio.
+        """
+        results = []
+        self.warnings = []
+        
+        # Calculate date range with larger buffer for trading days
+        start_date, end_date = self.date_range(lookback)
         
         logger.info(f"Starting screening for {len(tickers)} tickers with benchmark {benchmark}")
         logger.info(f"Date range: {start_date} to {end_date}")
         logger.info(f"Lookback period: {lookback} days")
         
-        # Get benchmark data
-        logger.info(f"Fetching benchmark data for {benchmark}")
-        benchmark_data = self.safe_download(benchmark, start_date, end_date)
+        # Fetch benchmark and all stocks in one batched request
+        clean_tickers = self.validator.sanitize_tickers(tickers)
+        if price_data is None:
+            logger.info(f"Fetching data for benchmark {benchmark} and {len(clean_tickers)} tickers")
+            price_data = self.safe_download_multiple([benchmark] + clean_tickers, start_date, end_date, threads)
+        
+        benchmark_data = price_data.get(benchmark)
         if benchmark_data is None:
             raise ValueError(f"Cannot fetch benchmark data for {benchmark}")
         
         logger.info(f"Benchmark data fetched: {len(benchmark_data)} points")
         
-        # Process each ticker
-        for ticker in tickers:
-            try:
-                logger.info(f"Processing ticker: {ticker}")
-                # Sanitize ticker
-                clean_ticker = self.validator.sanitize_ticker(ticker)
-                
-                # Get stock data
-                logger.info(f"Fetching stock data for {clean_ticker}")
-                stock_data = self.safe_download(clean_ticker, start_date, end_date)
-                
-                if stock_data is None:
-                    logger.warning(f"No data available for {clean_ticker}")
-                    continue
-                    
-                logger.info(f"Stock data fetched for {clean_ticker}: {len(stock_data)} points")
-                
-                # Validate data
-                logger.info(f"Validating data for {clean_ticker}")
-                is_valid, message = self.validator.validate_stock_data(stock_data, clean_ticker)
-                if not is_valid:
-                    logger.warning(f"Validation failed for {clean_ticker}: {message}")
-                    continue
-                
-                # Calculate metrics
-                logger.info(f"Calculating metrics for {clean_ticker}")
-                metrics = self.calculate_metrics(stock_data, benchmark_data, lookback)
-                logger.info(f"Metrics calculated for {clean_ticker}: {metrics is not None}")
-                
-                if metrics:
-                    metrics['Ticker'] = clean_ticker
-                    results.append(metrics)
-                    logger.info(f"Successfully processed {clean_ticker}")
-                else:
-                    logger.warning(f"No metrics calculated for {clean_ticker}")
-                    
-            except Exception as e:
-                logger.error(f"Error processing {ticker}: {e}")
-                continue
+        # Load and validate each ticker
+        valid_data: Dict[str, pd.Series] = {}
+        for ticker, clean_ticker in zip(tickers, clean_tickers):
+            stock_data, message = self._load_one_ticker(ticker, clean_ticker, price_data, benchmark_data)
+            if message is not None:
+                self.warnings.append(message)
+            else:
+                valid_data[clean_ticker] = stock_data
+        
+        # Calculate metrics
+        metrics_by_ticker = self._calculate_metrics_for(valid_data, benchmark_data, lookback)
+        for clean_ticker in valid_data:
+            metrics = metrics_by_ticker.get(clean_ticker)
+            if metrics:
+                metrics['Ticker'] = clean_ticker
+                results.append(metrics)
+                logger.info(f"Successfully processed {clean_ticker}")
+            else:
+                self._warn(f"No metrics calculated for {clean_ticker}")
         
         logger.info(f"Screening complete. {len(results)} stocks processed successfully")
         
         if results:
             df = pd.DataFrame(results)
             df.set_index('Ticker', inplace=True)
+            if top_k is not None and 0 < top_k < len(df):
+                # Select the top rows in linear time, then sort only those (NaN ranks last)
+                keys = -df['Information Ratio'].to_numpy(dtype=np.float64)
+                keys[np.isnan(keys)] = np.inf
+                df = df.iloc[np.argpartition(keys, top_k - 1)[:top_k]]
             return df.sort_values('Information Ratio', ascending=False)
         
         return pd.DataFrame()
     
-    def calculate_metrics(self, stock_data: pd.Series, benchmark_data: pd.Series, lookback: int) -> Dict:
-        """Calculate all metrics for a stock"""
-        logger.debug(f"Starting metrics calculation with lookback: {lookback}")
+    def _load_one_ticker(self, ticker: str, clean_ticker: str, price_data: Dict[str, pd.Series],
+                         benchmark_data: pd.Series) -> Tuple[Optional[pd.Series], Optional[str]]:
+        """Align and validate one ticker's prices; returns (data, None) or (None, warning)"""
+        try:
+            logger.debug("Processing ticker: %s", clean_ticker)
+            stock_data = price_data.get(clean_ticker)
+            
+            if stock_data is None:
+                message = f"No data available for {clean_ticker}"
+                logger.warning(message)
+                return None, message
+                
+            logger.debug("Stock data fetched for %s: %d points", clean_ticker, len(stock_data))
+            
+            # Put the stock on the benchmark's calendar once, so calculate_metrics
+            # can skip the per-ticker join
+            if not stock_data.index.equals(benchmark_data.index):
+                stock_data = stock_data.reindex(benchmark_data.index).dropna()
+            
+            # Validate data
+            logger.debug("Validating data for %s", clean_ticker)
+            is_valid, message = self.validator.validate_stock_data(stock_data, clean_ticker)
+            if not is_valid:
+                message = f"Validation failed for {clean_ticker}: {message}"
+                logger.warning(message)
+                return None, message
+            
+            return stock_data, None
+                
+        except Exception as e:
+            logger.error(f"Error processing {ticker}: {e}")
+            return None, f"Error processing {ticker}: {e}"
+    
+    async def screen_stocks_async(self, tickers: List[str], benchmark: str, lookback: int) -> pd.DataFrame:
+        """Run screening with every price series downloaded concurrently by the async fetcher"""
+        start_date, end_date = self.date_range(lookback)
+        clean_tickers = self.validator.sanitize_tickers(tickers)
+        
+        logger.info(f"Fetching data for benchmark {benchmark} and {len(clean_tickers)} tickers asynchronously")
+        downloads = await self.async_fetcher.download_multiple_stocks(
+            list(dict.fromkeys([benchmark] + clean_tickers)), start_date, end_date
+        )
+        # Failed downloads come back as exceptions; screen_stocks reports them as missing data
+        price_data = {
+            ticker: None if isinstance(data, Exception) else data
+            for ticker, data in downloads.items()
+        }
+        return self.screen_stocks(tickers, benchmark, lookback, price_data=price_data)
+    
+    def _calculate_metrics_for(self, stock_data_dict: Dict[str, pd.Series], benchmark_data: pd.Series,
+                               lookback: int) -> Dict[str, Dict]:
+        """Metrics for every validated ticker; large universes are chunked across threads"""
+        # Tickers that traded on every day of the window share one batched computation
+        if len(stock_data_dict) >= self.PARALLEL_MIN_TICKERS:
+            logger.info(f"Calculating metrics for {len(stock_data_dict)} tickers in parallel")
+            metrics_by_ticker = self.parallel_processor.parallel_metric_calculation(
+                stock_data_dict, benchmark_data, lookback, metrics_engine=self.metrics_engine
+            )
+        else:
+            metrics_by_ticker = self._calculate_metrics_batched(stock_data_dict, benchmark_data, [lookback])[lookback]
+        
+        # Tickers with gaps are aligned to the benchmark one at a time, sharing its returns
+        benchmark_returns = None
+        for ticker, stock_data in stock_data_dict.items():
+            if ticker in metrics_by_ticker:
+                continue
+            if benchmark_returns is None:
+                benchmark_returns = self._simple_returns(benchmark_data)
+            try:
+                logger.debug("Calculating metrics for %s", ticker)
+                metrics_by_ticker[ticker] = self.calculate_metrics(
+                    stock_data, benchmark_data, lookback, benchmark_returns=benchmark_returns
+                )
+            except Exception as e:
+                logger.error(f"Error calculating metrics for {ticker}: {e}")
+        return metrics_by_ticker
+    
+    def calculate_metrics_for_lookbacks(self, stock_data_dict: Dict[str, pd.Series], benchmark_data: pd.Series,
+                                        lookbacks: List[int]) -> Dict[int, Dict[str, Dict]]:
+        """Metrics for several lookbacks at once, sharing one returns matrix between them"""
+        results = self._calculate_metrics_batched(stock_data_dict, benchmark_data, lookbacks)
+        benchmark_returns = self._simple_returns(benchmark_data)
+        for lookback in lookbacks:
+            for ticker, stock_data in stock_data_dict.items():
+                if ticker not in results[lookback]:
+                    results[lookback][ticker] = self.calculate_metrics(
+                        stock_data, benchmark_data, lookback, benchmark_returns=benchmark_returns
+                    )
+        return results
+    
+    def _calculate_metrics_batched(self, stock_data_dict: Dict[str, pd.Series], benchmark_data: pd.Series,
+                                   lookbacks: List[int]) -> Dict[int, Dict[str, Dict]]:
+        """Metrics for tickers with a complete window, per lookback, from one returns matrix.
+        
+        The matrix covers the longest lookback; shorter ones are column views of it.
+        """
+        results: Dict[int, Dict[str, Dict]] = {lookback: {} for lookback in lookbacks}
+        if not stock_data_dict or len(benchmark_data) < min(lookbacks) + 1:
+            return results
+        
+        try:
+            tickers, returns, benchmark_returns = window_returns(stock_data_dict, benchmark_data, max(lookbacks))
+            for lookback in lookbacks:
+                if lookback > returns.shape[1]:
+                    continue
+                window = returns[:, -lookback:]
+                window_benchmark = benchmark_returns[-lookback:]
+                if np.isnan(window_benchmark).any():
+                    continue
+                
+                # Rows with gaps keep the per-ticker path, which drops missing days first
+                complete = ~np.isnan(window).any(axis=1)
+                if not complete.any():
+                    continue
+                self.metrics_engine.set_benchmark(window_benchmark)
+                batched = self.metrics_engine.calculate_all_metrics_batched(
+                    window if complete.all() else window[complete]
+                )
+                complete_tickers = [ticker for ticker, ok in zip(tickers, complete) if ok]
+                results[lookback] = {
+                    ticker: {name: float(values[i]) for name, values in batched.items()}
+                    for i, ticker in enumerate(complete_tickers)
+                }
+        except Exception as e:
+            logger.error(f"Error in batched metrics calculation: {e}", exc_info=True)
+        return results
+    
+    def _warn(self, message: str) -> None:
+        """Log a per-ticker warning and keep it for the UI to show after the run"""
+        logger.warning(message)
+        self.warnings.append(message)
+    
+    def calculate_metrics(self, stock_data: pd.Series, benchmark_data: pd.Series, lookback: int,
+                          benchmark_returns: Optional[np.ndarray] = None) -> Dict:
+        """Calculate all metrics for a stock.
+        
+        benchmark_returns may carry the benchmark's simple returns when the caller
+        computes them once for many stocks.
+        """
+        logger.debug("Starting metrics calculation with lookback: %d", lookback)
         
         if stock_data is None:
             logger.warning("Stock data is None")
@@ -112,42 +259,64 @@ class ScreenerEngine:
             logger.warning("Benchmark data is empty")
             return None
         
-        logger.debug(f"Stock data length: {len(stock_data)}, Benchmark data length: {len(benchmark_data)}")
+        logger.debug("Stock data length: %d, Benchmark data length: %d", len(stock_data), len(benchmark_data))
         
-        # Calculate returns
+        # Calculate returns directly on the price arrays
         logger.debug("Calculating stock returns")
-        stock_returns = stock_data.pct_change().dropna()
-        logger.debug(f"Stock returns calculated: {len(stock_returns)} points")
+        stock_returns = self._simple_returns(stock_data)
+        logger.debug("Stock returns calculated: %d points", len(stock_returns))
         
-        logger.debug("Calculating benchmark returns")
-        benchmark_returns = benchmark_data.pct_change().dropna()
-        logger.debug(f"Benchmark returns calculated: {len(benchmark_returns)} points")
+        if benchmark_returns is None:
+            logger.debug("Calculating benchmark returns")
+            benchmark_returns = self._simple_returns(benchmark_data)
+        logger.debug("Benchmark returns calculated: %d points", len(benchmark_returns))
         
-        # Align data
+        # Align data - series already on the same calendar need no join
         logger.debug("Aligning data")
-        aligned_data = pd.concat([stock_returns, benchmark_returns], axis=1).dropna()
-        logger.debug(f"Aligned data length: {len(aligned_data)}")
+        if stock_data.index.equals(benchmark_data.index):
+            aligned_data = np.column_stack((stock_returns, benchmark_returns))
+        else:
+            # Inner join on dates; positions into each return array avoid building a frame
+            stock_index = stock_data.index[1:]
+            benchmark_index = benchmark_data.index[1:]
+            common = stock_index.intersection(benchmark_index)
+            aligned_data = np.column_stack((
+                stock_returns[stock_index.get_indexer(common)],
+                benchmark_returns[benchmark_index.get_indexer(common)]
+            ))
+        aligned_data = aligned_data[~np.isnan(aligned_data).any(axis=1)]
+        logger.debug("Aligned data length: %d", len(aligned_data))
         
         if len(aligned_data) < lookback:
             logger.warning(f"Insufficient aligned data: {len(aligned_data)} < {lookback}")
             return None
         
-        # Use recent data for calculations
+        # Use recent data for calculations - slice the raw arrays so the metric
+        # reductions run on NumPy buffers instead of pandas Series
         logger.debug("Extracting recent data")
-        recent_stock = aligned_data.iloc[:, 0].tail(lookback)
-        recent_benchmark = aligned_data.iloc[:, 1].tail(lookback)
-        logger.debug(f"Recent stock data: {len(recent_stock)}, Recent benchmark data: {len(recent_benchmark)}")
+        recent = aligned_data[-lookback:]
+        recent_stock = recent[:, 0]
+        recent_benchmark = recent[:, 1]
+        logger.debug("Recent stock data: %d, Recent benchmark data: %d", len(recent_stock), len(recent_benchmark))
         
         # Calculate all metrics using MetricsEngine
         logger.debug("Calling MetricsEngine.calculate_all_metrics")
         try:
             metrics = self.metrics_engine.calculate_all_metrics(recent_stock, recent_benchmark)
-            logger.debug(f"Metrics calculated successfully: {list(metrics.keys()) if metrics else None}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Metrics calculated successfully: %s", list(metrics.keys()) if metrics else None)
             return metrics
         except Exception as e:
             logger.error(f"Error in MetricsEngine.calculate_all_metrics: {e}", exc_info=True)
             return None
     
+    @staticmethod
+    def _simple_returns(prices: pd.Series) -> np.ndarray:
+        """Period-over-period returns as a float64 array, one shorter than prices"""
+        values = prices.to_numpy(dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.diff(values) / values[:-1]
+    
     def safe_download(self, ticker: str, start_date: datetime, end_date: datetime) -> pd.Series:
         """Download stock data safely using DataManager"""
         try:
@@ -155,3 +324,12 @@ class ScreenerEngine:
         except Exception as e:
             logger.error(f"Error downloading data for {ticker}: {e}")
             return None
+    
+    def safe_download_multiple(self, tickers: List[str], start_date: datetime, end_date: datetime,
+                               threads: Optional[Union[bool, int]] = None) -> Dict[str, pd.Series]:
+        """Download several tickers safely in one batch using DataManager"""
+        try:
+            return self.data_manager.get_multiple_stocks(tickers, start_date, end_date, threads=threads)
+        except Exception as e:
+            logger.error(f"Error downloading data for {tickers}: {e}")
+            return {}
@@ -1,11 +1,69 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from screener_engine import ScreenerEngine
+from data_manager import DataManager
 from config import ScreenerConfig
-from datetime import datetime, timedelta
-from typing import Dict
+from datetime import date, datetime, timedelta
+from typing import Dict, Tuple
+
+# Decimal places shown per metric column in the results table
+DISPLAY_DECIMALS = {
+    'Information Ratio': 3,
+    'Alpha': 3,
+    'Sharpe Ratio': 3,
+    'Beta': 3,
+    'Relative Strength': 4,
+    'Total Return': 4,
+}
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_prices(tickers: Tuple[str, ...], benchmark: str, start_date: date, end_date: date,
+                 _data_manager: DataManager) -> Dict[str, pd.Series]:
+    """Batched price download memoized across Streamlit reruns (the data manager is not hashed).
+    
+    Raises if the benchmark is missing so a transient failure is not cached.
+    """
+    prices = _data_manager.get_multiple_stocks(list(tickers), start_date, end_date)
+    if prices.get(benchmark) is None:
+        raise ValueError(f"Cannot fetch benchmark data for {benchmark}")
+    return prices
+
+@st.cache_data(show_spinner=False)
+def build_metrics_figure(results: pd.DataFrame) -> go.Figure:
+    """Bar charts for key metrics; cached so reruns with the same results skip rebuilding"""
+    metrics_to_plot = ['Information Ratio', 'Alpha', 'Sharpe Ratio']
+    
+    fig = make_subplots(
+        rows=len(metrics_to_plot), 
+        cols=1,
+        subplot_titles=metrics_to_plot,
+        vertical_spacing=0.1
+    )
+    
+    for i, metric in enumerate(metrics_to_plot):
+        if metric in results.columns:
+            # Order by one argsort instead of building a sorted frame per metric (NaN stays last)
+            values = results[metric].to_numpy(dtype=np.float64)
+            order = np.argsort(-values, kind='stable')
+            values = values[order]
+            colors = np.where(values > 0, 'green', 'red').tolist()
+            
+            fig.add_trace(
+                go.Bar(
+                    x=results.index[order],
+                    y=values,
+                    marker_color=colors,
+                    name=metric,
+                    showlegend=False
+                ),
+                row=i+1, col=1
+            )
+    
+    fig.update_layout(height=300*len(metrics_to_plot))
+    return fig
 
 class StreamlitApp:
     """Streamlit UI as specified in docs/specification.md"""
@@ -25,10 +83,20 @@ class StreamlitApp:
         if st.button("Run Screening"):
             with st.spinner('Analyzing stocks...'):
                 try:
+                    clean_tickers = self.engine.validator.sanitize_tickers(params['tickers'])
+                    start_date, end_date = self.engine.date_range(params['lookback'])
+                    prices = fetch_prices(
+                        tuple(sorted(set(clean_tickers + [params['benchmark']]))),
+                        params['benchmark'],
+                        start_date,
+                        end_date,
+                        self.engine.data_manager
+                    )
                     results = self.engine.screen_stocks(
                         params['tickers'], 
                         params['benchmark'], 
-                        params['lookback']
+                        params['lookback'],
+                        price_data=prices
                     )
                     
                     if not results.empty:
@@ -39,6 +107,11 @@ class StreamlitApp:
                         
                 except Exception as e:
                     st.error(f"Error during screening: {e}")
+            
+            # Emit all per-ticker warnings in one element instead of one per ticker
+            if self.engine.warnings:
+                with st.expander(f"Warnings ({len(self.engine.warnings)})"):
+                    st.text("\n".join(self.engine.warnings))
     
     def handle_user_input(self) -> Dict:
         """Handle user input from sidebar"""
@@ -76,15 +149,8 @@ class StreamlitApp:
         """Display screening results"""
         st.subheader("Screening Results")
         
-        # Format the dataframe for better display
-        formatted_df = results.copy()
-        for col in formatted_df.columns:
-            if col in ['Information Ratio', 'Alpha', 'Sharpe Ratio', 'Beta']:
-                formatted_df[col] = formatted_df[col].round(3)
-            elif col in ['Relative Strength', 'Total Return']:
-                formatted_df[col] = formatted_df[col].round(4)
-        
-        st.dataframe(formatted_df, use_container_width=True)
+        # Format the dataframe for better display in one vectorized call
+        st.dataframe(results.round(DISPLAY_DECIMALS), use_container_width=True)
     
     def create_visualizations(self, results: pd.DataFrame):
         """Create charts and visualizations"""
@@ -94,34 +160,7 @@ class StreamlitApp:
         tab1, tab2 = st.tabs(["Metrics Comparison", "Performance Rankings"])
         
         with tab1:
-            # Bar chart for key metrics
-            metrics_to_plot = ['Information Ratio', 'Alpha', 'Sharpe Ratio']
-            
-            fig = make_subplots(
-                rows=len(metrics_to_plot), 
-                cols=1,
-                subplot_titles=metrics_to_plot,
-                vertical_spacing=0.1
-            )
-            
-            for i, metric in enumerate(metrics_to_plot):
-                if metric in results.columns:
-                    sorted_df = results.sort_values(metric, ascending=False)
-                    colors = ['green' if val > 0 else 'red' for val in sorted_df[metric]]
-                    
-                    fig.add_trace(
-                        go.Bar(
-                            x=sorted_df.index,
-                            y=sorted_df[metric],
-                            marker_color=colors,
-                            name=metric,
-                            showlegend=False
-                        ),
-                        row=i+1, col=1
-                    )
-            
-            fig.update_layout(height=300*len(metrics_to_plot))
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(build_metrics_figure(results), use_container_width=True)
         
         with tab2:
             # Rankings table
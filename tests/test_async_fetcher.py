@@ -0,0 +1,119 @@
+import pytest
+import asyncio
+import pandas as pd
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import date
+from async_fetcher import AsyncDataFetcher
+
+class TestAsyncDataFetcher:
+    def setup_method(self):
+        self.fetcher = AsyncDataFetcher()
+
+    def test_should_parse_adjusted_close_from_chart_payload(self):
+        # Given
+        payload = {'chart': {'result': [{
+            'timestamp': [1704153600, 1704240000, 1704326400],
+            'indicators': {
+                'quote': [{'close': [100.0, 101.0, 102.0]}],
+                'adjclose': [{'adjclose': [99.0, None, 101.0]}]
+            }
+        }], 'error': None}}
+
+        # When
+        result = AsyncDataFetcher._parse_chart('AAPL', payload)
+
+        # Then
+        assert isinstance(result, pd.Series)
+        assert list(result) == [99.0, 101.0]
+        assert result.index[0] == pd.Timestamp('2024-01-02')
+
+    def test_should_date_bars_in_the_exchange_time_zone(self):
+        # Given
+        timestamps = [1704150000, 1704236400]  # 10:00 AEDT, still the previous day in UTC
+        quote = {'quote': [{'close': [100.0, 101.0]}]}
+        named = {'chart': {'result': [{
+            'meta': {'exchangeTimezoneName': 'Australia/Sydney', 'gmtoffset': 39600},
+            'timestamp': timestamps, 'indicators': quote
+        }], 'error': None}}
+        offset_only = {'chart': {'result': [{
+            'meta': {'gmtoffset': 39600}, 'timestamp': timestamps, 'indicators': quote
+        }], 'error': None}}
+
+        # When
+        by_name = AsyncDataFetcher._parse_chart('BHP.AX', named)
+        by_offset = AsyncDataFetcher._parse_chart('BHP.AX', offset_only)
+
+        # Then
+        expected = pd.DatetimeIndex(['2024-01-02', '2024-01-03'])
+        assert list(by_name.index) == list(expected)
+        assert list(by_offset.index) == list(expected)
+
+    def test_should_raise_when_chart_payload_has_error(self):
+        # Given
+        payload = {'chart': {'result': None, 'error': {'code': 'Not Found'}}}
+
+        # When/Then
+        with pytest.raises(ValueError, match="No chart data returned for NOPE"):
+            AsyncDataFetcher._parse_chart('NOPE', payload)
+
+    @patch('async_fetcher.AsyncDataFetcher.async_download')
+    def test_should_collect_results_and_errors_per_ticker(self, mock_download):
+        # Given
+        aapl = pd.Series([100.0, 101.0])
+
+        async def fake_download(ticker, start_date, end_date):
+            if ticker == 'NOPE':
+                raise ValueError("boom")
+            return aapl
+
+        mock_download.side_effect = fake_download
+
+        # When
+        results = asyncio.run(self.fetcher.download_multiple_stocks(['AAPL', 'NOPE'], date(2024, 1, 1), date(2024, 1, 31)))
+
+        # Then
+        assert results['AAPL'] is aapl
+        assert isinstance(results['NOPE'], ValueError)
+        assert self.fetcher._session is None  # Session is closed after the batch
+
+    def test_should_decode_raw_response_body(self):
+        # Given
+        body = (b'{"chart": {"result": [{"timestamp": [1704153600, 1704240000], '
+                b'"indicators": {"quote": [{"close": [100.0, 101.0]}]}}], "error": null}}')
+        resp = MagicMock()
+        resp.read = AsyncMock(return_value=body)
+        session = MagicMock()
+        session.get.return_value.__aenter__ = AsyncMock(return_value=resp)
+        session.get.return_value.__aexit__ = AsyncMock(return_value=False)
+        session.closed = False
+
+        async def download():
+            session._loop = asyncio.get_running_loop()
+            self.fetcher._session = session
+            return await self.fetcher.async_download('AAPL', date(2024, 1, 1), date(2024, 1, 31))
+
+        # When
+        result = asyncio.run(download())
+
+        # Then
+        assert list(result) == [100.0, 101.0]
+        resp.raise_for_status.assert_called_once()
+
+    def test_should_download_standalone_from_separate_event_loops(self):
+        # Given
+        body = (b'{"chart": {"result": [{"timestamp": [1704153600, 1704240000], '
+                b'"indicators": {"quote": [{"close": [100.0, 101.0]}]}}], "error": null}}')
+        resp = MagicMock()
+        resp.read = AsyncMock(return_value=body)
+        request = MagicMock()
+        request.__aenter__ = AsyncMock(return_value=resp)
+        request.__aexit__ = AsyncMock(return_value=False)
+
+        # When
+        with patch('async_fetcher.aiohttp.ClientSession.get', return_value=request):
+            first = asyncio.run(self.fetcher.async_download('AAPL', date(2024, 1, 1), date(2024, 1, 31)))
+            second = asyncio.run(self.fetcher.async_download('AAPL', date(2024, 1, 1), date(2024, 1, 31)))
+
+        # Then
+        assert list(first) == list(second) == [100.0, 101.0]
+        assert self.fetcher._session is None  # Each call closed the session it opened
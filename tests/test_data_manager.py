@@ -1,5 +1,6 @@
 import pytest
 import pandas as pd
+import numpy as np
 from unittest.mock import Mock, patch, MagicMock
 from datetime import date, datetime, timedelta
 from data_manager import DataManager
@@ -180,3 +181,176 @@ class TestDataManager:
         assert isinstance(result, pd.Series)
         assert len(result) == 12
         assert result.iloc[0] == 100  # Should use first column (Open)
+
+    @patch('data_manager.DataManager._bulk_load_cached')
+    @patch('data_manager.DataManager._cache_data')
+    @patch('data_manager.yf.download')
+    def test_should_fetch_multiple_tickers_in_single_download(self, mock_download, mock_cache_store, mock_cache_get):
+        # Given
+        mock_cache_get.return_value = {'SPY': pd.Series([1.0] * 12)}
+        columns = pd.MultiIndex.from_tuples([
+            ('AAPL', 'Close'), ('AAPL', 'Volume'), ('MSFT', 'Close'), ('MSFT', 'Volume')
+        ])
+        mock_download.return_value = pd.DataFrame({
+            ('AAPL', 'Close'): [100, 101, 102, 99, 103, 104, 98, 105, 106, 107, 108, 109],
+            ('AAPL', 'Volume'): [1000] * 12,
+            ('MSFT', 'Close'): [200, 201, 202, 199, 203, 204, 198, 205, 206, 207, 208, 209],
+            ('MSFT', 'Volume'): [2000] * 12
+        }, columns=columns)
+
+        # When
+        result = self.data_manager.get_multiple_stocks(['SPY', 'AAPL', 'MSFT', 'NOPE'], date(2024, 1, 1), date(2024, 1, 31))
+
+        # Then
+        mock_download.assert_called_once()
+        assert mock_download.call_args[0][0] == ['AAPL', 'MSFT', 'NOPE']
+        assert result['AAPL'].iloc[0] == 100
+        assert result['MSFT'].iloc[-1] == 209
+        assert len(result['SPY']) == 12
+        assert result['NOPE'] is None
+        assert mock_cache_store.call_count == 2
+
+    @patch('data_manager.DataManager._bulk_load_cached', return_value={})
+    @patch('data_manager.DataManager._cache_data')
+    @patch('data_manager.yf.download')
+    def test_should_pass_thread_count_to_batched_download(self, mock_download, mock_cache_store, mock_cache_get):
+        # Given
+        mock_download.return_value = pd.DataFrame()
+
+        # When
+        self.data_manager.get_multiple_stocks(['AAPL', 'MSFT'], date(2024, 1, 1), date(2024, 1, 31), threads=4)
+        self.data_manager.get_multiple_stocks(['AAPL', 'MSFT'], date(2024, 1, 1), date(2024, 1, 31))
+
+        # Then
+        assert mock_download.call_args_list[0][1]['threads'] == 4
+        assert mock_download.call_args_list[1][1]['threads'] is True
+
+    def test_should_use_wal_journal_and_round_trip_cached_data(self):
+        # Given
+        data = pd.Series([100.0, 101.0, 102.0], index=pd.date_range('2024-01-01', periods=3))
+
+        # When
+        self.data_manager._cache_data('WALT', data, date(2024, 1, 1), date(2024, 1, 31))
+        self.data_manager.flush_cache()
+        result = self.data_manager._get_cached_data('WALT', date(2024, 1, 1), date(2024, 1, 31))
+        journal_mode = self.data_manager._conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+        # Then
+        assert journal_mode == 'wal'
+        assert result.equals(data)
+
+    def test_should_slice_cached_range_that_covers_request(self):
+        # Given
+        data = pd.Series([100.0, 101.0, 102.0, 103.0, 104.0], index=pd.date_range('2024-03-01', periods=5))
+        self.data_manager._cache_data('SLICE', data, date(2024, 3, 1), date(2024, 3, 31))
+        self.data_manager.flush_cache()
+
+        # When
+        shifted = self.data_manager._get_cached_data('SLICE', date(2024, 3, 2), date(2024, 3, 4))
+        uncovered = self.data_manager._get_cached_data('SLICE', date(2024, 2, 28), date(2024, 3, 4))
+
+        # Then
+        assert list(shifted) == [101.0, 102.0]
+        assert uncovered is None
+
+    def test_should_not_serve_days_after_the_row_was_cached(self):
+        # Given
+        data = pd.Series(np.arange(100.0, 105.0), index=pd.date_range('2024-05-01', periods=5))
+        for ticker in ('STALE1', 'STALE2'):
+            self.data_manager._cache_data(ticker, data, date(2024, 1, 1), date(2024, 12, 31))
+        self.data_manager.flush_cache()
+        with self.data_manager._conn as conn:
+            conn.execute("UPDATE stock_cache SET cached_at='2024-06-01 12:00:00' WHERE ticker LIKE 'STALE%'")
+
+        # When
+        past = self.data_manager._get_cached_data('STALE1', date(2024, 3, 1), date(2024, 5, 3))
+        later = self.data_manager._get_cached_data('STALE1', date(2024, 3, 1), date(2024, 9, 1))
+        exact = self.data_manager._get_cached_data('STALE1', date(2024, 1, 1), date(2024, 12, 31))
+        bulk = self.data_manager._bulk_load_cached(['STALE1', 'STALE2'], date(2024, 3, 1), date(2024, 9, 1))
+
+        # Then
+        assert list(past) == [100.0, 101.0]
+        assert later is None
+        assert exact.equals(data)
+        assert bulk == {}
+
+    def test_should_load_many_cached_tickers_in_one_query(self):
+        # Given
+        data = pd.Series([100.0, 101.0, 102.0], index=pd.date_range('2024-04-01', periods=3))
+        for ticker in ('BULK1', 'BULK2'):
+            self.data_manager._cache_data(ticker, data, date(2024, 4, 1), date(2024, 4, 30))
+        self.data_manager.flush_cache()
+
+        # When
+        result = self.data_manager._bulk_load_cached(['BULK1', 'BULK2', 'BULK3'], date(2024, 4, 2), date(2024, 4, 30))
+
+        # Then
+        assert set(result) == {'BULK1', 'BULK2'}
+        assert list(result['BULK2']) == [101.0, 102.0]
+
+    def test_should_defer_cache_writes_until_flush(self):
+        # Given
+        data = pd.Series([100.0, 101.0, 102.0], index=pd.date_range('2024-01-01', periods=3))
+        tickers = ['BATCH1', 'BATCH2', 'BATCH3']
+
+        # When
+        for ticker in tickers:
+            self.data_manager._cache_data(ticker, data, date(2024, 2, 1), date(2024, 2, 28))
+        pending_before_flush = len(self.data_manager._pending)
+        self.data_manager.flush_cache()
+
+        # Then
+        assert pending_before_flush == 3
+        assert self.data_manager._pending == []
+        for ticker in tickers:
+            assert self.data_manager._get_cached_data(ticker, date(2024, 2, 1), date(2024, 2, 28)).equals(data)
+
+    @patch('data_manager.DataManager._get_cached_data')
+    @patch('data_manager.DataManager._fetch_fresh_data')
+    @patch('data_manager.DataManager._cache_data')
+    def test_should_serve_repeat_requests_from_bounded_memory_cache(self, mock_cache_store, mock_fetch, mock_cache_get):
+        # Given
+        mock_cache_get.return_value = None
+        mock_fetch.side_effect = lambda ticker, start, end: pd.Series([100.0, 101.0], name=ticker)
+        self.data_manager.MEMORY_CACHE_SIZE = 2
+
+        # When
+        first = self.data_manager.get_stock_data('AAPL', date(2024, 1, 1), date(2024, 1, 31))
+        again = self.data_manager.get_stock_data('AAPL', date(2024, 1, 1), date(2024, 1, 31))
+        self.data_manager.get_stock_data('MSFT', date(2024, 1, 1), date(2024, 1, 31))
+        self.data_manager.get_stock_data('NVDA', date(2024, 1, 1), date(2024, 1, 31))
+
+        # Then
+        assert again is first
+        assert mock_fetch.call_count == 3
+        assert [key[0] for key in self.data_manager._mem_cache] == ['MSFT', 'NVDA']
+
+    def test_should_return_dates_and_prices_as_arrays(self):
+        # Given
+        data = pd.Series([100.0, 101.0, 102.0], index=pd.date_range('2024-05-01', periods=3))
+        self.data_manager._cache_data('ARR', data, date(2024, 5, 1), date(2024, 5, 31))
+        self.data_manager.flush_cache()
+
+        # When
+        dates, prices = self.data_manager.get_stock_arrays('ARR', date(2024, 5, 1), date(2024, 5, 31))
+
+        # Then
+        assert dates.dtype == 'datetime64[ns]'
+        assert prices.dtype == np.float64
+        assert list(prices) == [100.0, 101.0, 102.0]
+        assert (dates == data.index.as_unit('ns').to_numpy()).all()
+
+    def test_should_share_one_date_index_between_cached_series(self):
+        # Given
+        index = pd.date_range('2024-06-03', periods=5)
+        for ticker, base in (('IDX1', 10.0), ('IDX2', 20.0)):
+            data = pd.Series(np.arange(5) + base, index=index.copy())
+            self.data_manager._cache_data(ticker, data, date(2024, 6, 1), date(2024, 6, 30))
+        self.data_manager.flush_cache()
+
+        # When
+        results = self.data_manager.get_multiple_stocks(['IDX1', 'IDX2'], date(2024, 6, 1), date(2024, 6, 30))
+
+        # Then
+        assert results['IDX1'].index is results['IDX2'].index
+        assert list(results['IDX2']) == [20.0, 21.0, 22.0, 23.0, 24.0]
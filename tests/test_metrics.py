@@ -1,11 +1,16 @@
 import pytest
 import pandas as pd
 import numpy as np
+import os
+import subprocess
+import sys
 import warnings
+import metrics
 from unittest.mock import Mock, patch
 from metrics import (
     MetricCalculator, InformationRatio, SharpeRatio, 
-    BetaCalculator, AlphaCalculator, MetricsEngine
+    BetaCalculator, AlphaCalculator, MetricsEngine,
+    ReturnStats, METRIC_NAMES, _return_moments_numpy, _batched_moments_numpy
 )
 
 class TestInformationRatio:
@@ -142,7 +147,8 @@ class TestMetricsEngine:
                 assert pd.isna(value), f"{metric} should be NaN for invalid data"
         
         # Should log a warning about invalid data
-        mock_logger.debug.assert_any_call("MetricsEngine: Starting calculation with 3 stock returns and 3 benchmark returns")
+        mock_logger.debug.assert_any_call(
+            "MetricsEngine: Starting calculation with %d stock returns and %d benchmark returns", 3, 3)
 
     def test_should_handle_single_data_point_gracefully(self):
         # Given
@@ -194,3 +200,222 @@ class TestMetricsEngine:
         assert 'Faulty Metric' in results
         assert pd.isna(results['Faulty Metric'])
         mock_logger.error.assert_called()  # Now error should be logged
+
+    def test_should_use_replaced_builtin_calculator(self):
+        # Given
+        stock_returns = pd.Series([0.01, 0.02, -0.01, 0.03])
+        benchmark_returns = pd.Series([0.005, 0.015, -0.005, 0.025])
+        engine = MetricsEngine()
+        custom_beta = Mock(spec=MetricCalculator)
+        custom_beta.calculate.return_value = 42.0
+
+        # When
+        engine.add_calculator('Beta', custom_beta)
+        results = engine.calculate_all_metrics(stock_returns, benchmark_returns)
+
+        # Then
+        assert results['Beta'] == 42.0
+        assert not pd.isna(results['Information Ratio'])
+
+    def test_should_accept_numpy_arrays_with_same_results_as_series(self):
+        # Given
+        stock_returns = pd.Series([0.01, 0.02, -0.01, 0.03, -0.005])
+        benchmark_returns = pd.Series([0.005, 0.015, -0.005, 0.025, 0.002])
+        engine = MetricsEngine()
+        
+        # When
+        series_results = engine.calculate_all_metrics(stock_returns, benchmark_returns)
+        array_results = engine.calculate_all_metrics(stock_returns.to_numpy(), benchmark_returns.to_numpy())
+        
+        # Then
+        for metric, value in series_results.items():
+            assert array_results[metric] == pytest.approx(value)
+        assert series_results['Total Return'] == pytest.approx((1 + stock_returns).cumprod().iloc[-1] - 1)
+
+    def test_should_match_pandas_reference_formulas(self):
+        # Given
+        rng = np.random.default_rng(42)
+        stock_returns = pd.Series(rng.normal(0.001, 0.02, 60))
+        benchmark_returns = pd.Series(rng.normal(0.0005, 0.01, 60))
+        rf = 0.03 / 252
+        engine = MetricsEngine()
+        
+        # When
+        results = engine.calculate_all_metrics(stock_returns, benchmark_returns)
+        
+        # Then
+        excess = stock_returns - benchmark_returns
+        beta = np.cov(stock_returns, benchmark_returns)[0, 1] / benchmark_returns.var()
+        assert results['Information Ratio'] == pytest.approx(excess.mean() / excess.std(), rel=1e-9)
+        assert results['Sharpe Ratio'] == pytest.approx((stock_returns.mean() - rf) / stock_returns.std() * np.sqrt(252), rel=1e-9)
+        assert results['Beta'] == pytest.approx(beta, rel=1e-9)
+        assert results['Alpha'] == pytest.approx((stock_returns.mean() - rf - beta * (benchmark_returns.mean() - rf)) * 252, rel=1e-9)
+        assert results['Relative Strength'] == pytest.approx((1 + stock_returns).prod() / (1 + benchmark_returns).prod(), rel=1e-9)
+        assert list(results) == list(METRIC_NAMES)
+
+    def test_should_match_per_ticker_metrics_in_batched_mode(self):
+        # Given
+        rng = np.random.default_rng(11)
+        returns_matrix = rng.normal(0.001, 0.02, (4, 60))
+        returns_matrix[2] = 0.01  # Constant row
+        returns_matrix[3, 5] = np.nan
+        benchmark_returns = rng.normal(0.0005, 0.01, 60)
+        engine = MetricsEngine()
+        
+        # When
+        batched = engine.calculate_all_metrics_batched(returns_matrix, benchmark_returns)
+        
+        # Then
+        assert list(batched) == list(METRIC_NAMES)
+        for i, row in enumerate(returns_matrix):
+            expected = engine.calculate_all_metrics(row, benchmark_returns)
+            for name in METRIC_NAMES:
+                assert batched[name][i] == pytest.approx(expected[name], rel=1e-9, nan_ok=True)
+
+    def test_should_return_nan_beta_in_batched_mode_for_flat_benchmark(self):
+        # Given
+        rng = np.random.default_rng(17)
+        returns_matrix = rng.normal(0.001, 0.02, (3, 40))
+        benchmark_returns = np.full(40, 0.001)
+        engine = MetricsEngine()
+        
+        # When
+        batched = engine.calculate_all_metrics_batched(returns_matrix, benchmark_returns)
+        
+        # Then
+        assert np.isnan(batched['Beta']).all()
+        assert np.isnan(batched['Alpha']).all()
+        assert np.isfinite(batched['Relative Strength']).all()
+
+    @pytest.mark.parametrize("moments", [None, _batched_moments_numpy])
+    def test_should_match_float64_results_with_float32_storage(self, moments):
+        # Given
+        rng = np.random.default_rng(13)
+        returns_matrix = rng.normal(0.001, 0.02, (3, 60))
+        benchmark_returns = rng.normal(0.0005, 0.01, 60)
+        
+        # When
+        with patch('metrics._batched_moments', moments or metrics._batched_moments):
+            single = MetricsEngine(precision='float32').calculate_all_metrics_batched(returns_matrix, benchmark_returns)
+            double = MetricsEngine().calculate_all_metrics_batched(returns_matrix, benchmark_returns)
+        
+        # Then
+        for name in METRIC_NAMES:
+            assert single[name].dtype == np.float64
+            np.testing.assert_allclose(single[name], double[name], rtol=1e-4)
+    
+    def test_should_reject_unknown_precision(self):
+        # When/Then
+        with pytest.raises(ValueError, match="Unsupported precision"):
+            MetricsEngine(precision='float16')
+    
+    def test_should_reuse_benchmark_set_once_for_batched_calls(self):
+        # Given
+        rng = np.random.default_rng(3)
+        returns_matrix = rng.normal(0.001, 0.02, (2, 30))
+        benchmark_returns = rng.normal(0.0005, 0.01, 30)
+        engine = MetricsEngine()
+        
+        # When
+        engine.set_benchmark(benchmark_returns)
+        with patch('metrics.BenchmarkStats.from_returns') as mock_stats:
+            cached = engine.calculate_all_metrics_batched(returns_matrix)
+        explicit = engine.calculate_all_metrics_batched(returns_matrix, benchmark_returns)
+        
+        # Then
+        mock_stats.assert_not_called()
+        for name in METRIC_NAMES:
+            np.testing.assert_array_equal(cached[name], explicit[name])
+    
+    def test_should_require_a_benchmark_for_batched_calls(self):
+        # When/Then
+        with pytest.raises(ValueError, match="no benchmark set"):
+            MetricsEngine().calculate_all_metrics_batched(np.zeros((2, 5)))
+
+    @pytest.mark.skipif(not metrics.NUMBA_AVAILABLE, reason="numba is not installed")
+    def test_should_survive_concurrent_batched_calls_on_workqueue_layer(self):
+        # Given
+        script = (
+            "import threading\n"
+            "import numpy as np\n"
+            "from metrics import MetricsEngine\n"
+            "R = np.random.default_rng(0).normal(0, 0.01, (500, 60))\n"
+            "def work():\n"
+            "    engine = MetricsEngine()\n"
+            "    for _ in range(20):\n"
+            "        engine.calculate_all_metrics_batched(R, R[0])\n"
+            "threads = [threading.Thread(target=work) for _ in range(4)]\n"
+            "[t.start() for t in threads]\n"
+            "[t.join() for t in threads]\n"
+        )
+        env = dict(os.environ, NUMBA_THREADING_LAYER='workqueue')
+        
+        # When
+        result = subprocess.run([sys.executable, '-c', script], env=env, cwd=os.path.dirname(metrics.__file__),
+                                capture_output=True, text=True, timeout=120)
+        
+        # Then
+        assert result.returncode == 0, result.stderr
+
+class TestReturnStats:
+    def test_should_compute_same_moments_with_and_without_numba(self):
+        # Given
+        rng = np.random.default_rng(7)
+        stock_returns = rng.normal(0.001, 0.02, 60)
+        benchmark_returns = rng.normal(0.0005, 0.01, 60)
+        
+        # When
+        fast = ReturnStats.from_returns(stock_returns, benchmark_returns)
+        with patch('metrics._return_moments', _return_moments_numpy):
+            reference = ReturnStats.from_returns(stock_returns, benchmark_returns)
+        
+        # Then
+        for field in ('mean_s', 'mean_b', 'mean_excess', 'var_s', 'var_b', 'var_excess', 'cov_sb', 'cum_s', 'cum_b'):
+            assert getattr(fast, field) == pytest.approx(getattr(reference, field), rel=1e-9)
+        assert fast.n == reference.n == 60
+    
+    @pytest.mark.parametrize("moments", [None, _return_moments_numpy])
+    def test_should_report_zero_variance_for_constant_returns(self, moments):
+        # When
+        with patch('metrics._return_moments', moments or metrics._return_moments):
+            stats = ReturnStats.from_returns(np.full(60, 0.01), np.full(60, 0.01))
+        
+        # Then
+        assert stats.var_s == 0
+        assert stats.var_b == 0
+        assert stats.var_excess == 0
+    
+    def test_should_reject_returns_of_different_length(self):
+        # When/Then
+        with pytest.raises(ValueError, match="differ in length"):
+            ReturnStats.from_returns(np.zeros(3), np.zeros(4))
+
+    def test_should_compute_same_batched_moments_with_and_without_numba(self):
+        # Given
+        rng = np.random.default_rng(5)
+        returns_matrix = rng.normal(0.001, 0.02, (3, 60))
+        returns_matrix[1] = 0.01
+        benchmark_returns = rng.normal(0.0005, 0.01, 60)
+        
+        # When
+        fast = metrics._batched_moments(returns_matrix, benchmark_returns)
+        reference = _batched_moments_numpy(returns_matrix, benchmark_returns)
+        
+        # Then
+        for fast_values, reference_values in zip(fast, reference):
+            np.testing.assert_allclose(fast_values, reference_values, rtol=1e-9, atol=1e-15)
+        assert fast[2][1] == 0  # Constant row has exactly zero variance
+
+class TestAlphaCalculator:
+    def test_should_use_precomputed_beta_from_stats(self):
+        # Given
+        stats = ReturnStats.from_returns(np.array([0.01, 0.02, -0.01, 0.03]), np.array([0.005, 0.015, -0.005, 0.025]))
+        calculator = AlphaCalculator(risk_free_rate=0.0)
+        
+        # When
+        with patch('metrics.BetaCalculator') as mock_beta:
+            result = calculator.from_stats(stats)
+        
+        # Then
+        mock_beta.assert_not_called()
+        assert result == pytest.approx((stats.mean_s - stats.beta * stats.mean_b) * 252)
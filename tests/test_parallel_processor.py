@@ -0,0 +1,77 @@
+import pytest
+import pandas as pd
+import numpy as np
+from parallel_processor import ParallelProcessor, window_returns
+from metrics import MetricsEngine
+
+class TestParallelProcessor:
+    def setup_method(self):
+        self.processor = ParallelProcessor()
+        dates = pd.date_range('2024-01-01', periods=50)
+        self.benchmark_data = pd.Series(100 + np.cumsum(np.cos(np.arange(50)) * 0.5), index=dates)
+        self.stock_data = pd.Series(100 + np.cumsum(np.sin(np.arange(50))), index=dates)
+
+    def test_should_match_serial_metrics_for_each_ticker(self):
+        # Given
+        stock_data_dict = {'AAPL': self.stock_data, 'MSFT': self.stock_data * 2, 'NONE': None}
+
+        # When
+        results = self.processor.parallel_metric_calculation(stock_data_dict, self.benchmark_data, 30)
+
+        # Then
+        expected = MetricsEngine().calculate_all_metrics(
+            self.stock_data.pct_change().dropna().tail(30), self.benchmark_data.pct_change().dropna().tail(30)
+        )
+        assert set(results) == {'AAPL', 'MSFT'}
+        for metric, value in expected.items():
+            assert results['AAPL'][metric] == pytest.approx(value)
+            assert results['MSFT'][metric] == pytest.approx(value)
+
+    def test_should_split_large_universes_into_chunks(self):
+        # Given
+        self.processor.CHUNK_ROWS = 2
+        stock_data_dict = {f'T{i}': self.stock_data * (i + 1) for i in range(5)}
+        stock_data_dict['GAP'] = self.stock_data.drop(self.stock_data.index[45])
+
+        # When
+        results = self.processor.parallel_metric_calculation(stock_data_dict, self.benchmark_data, 30)
+
+        # Then
+        assert set(results) == set(stock_data_dict) - {'GAP'}  # Gapped tickers are left to the caller
+        for i in range(1, 5):
+            assert results[f'T{i}']['Beta'] == pytest.approx(results['T0']['Beta'])
+
+    def test_should_use_supplied_metrics_engine(self):
+        # Given
+        engine = MetricsEngine(risk_free_rate=0.20)
+
+        # When
+        results = self.processor.parallel_metric_calculation(
+            {'AAPL': self.stock_data}, self.benchmark_data, 30, metrics_engine=engine
+        )
+
+        # Then
+        expected = engine.calculate_all_metrics(
+            self.stock_data.pct_change().dropna().tail(30), self.benchmark_data.pct_change().dropna().tail(30)
+        )
+        assert results['AAPL']['Sharpe Ratio'] == pytest.approx(expected['Sharpe Ratio'])
+
+    def test_should_return_nothing_for_insufficient_history(self):
+        # When
+        results = self.processor.parallel_metric_calculation({'AAPL': self.stock_data}, self.benchmark_data, 60)
+
+        # Then
+        assert results == {}
+
+    def test_should_build_row_major_returns_matrix(self):
+        # Given
+        stock_data_dict = {'AAPL': self.stock_data, 'MSFT': self.stock_data * 2}
+
+        # When
+        tickers, returns, benchmark_returns = window_returns(stock_data_dict, self.benchmark_data, 30)
+
+        # Then
+        assert tickers == ['AAPL', 'MSFT']
+        assert returns.shape == (2, 30)
+        assert returns.flags['C_CONTIGUOUS']
+        assert len(benchmark_returns) == 30
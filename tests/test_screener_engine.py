@@ -1,9 +1,12 @@
 import pytest
+import asyncio
 import pandas as pd
 import numpy as np
-from unittest.mock import Mock, patch, MagicMock
-from datetime import datetime, timedelta
+from unittest.mock import ANY, AsyncMock, Mock, patch, MagicMock
+from datetime import date, datetime, timedelta
 from screener_engine import ScreenerEngine
+from metrics import MetricsEngine
+from parallel_processor import window_returns
 from config import ScreenerConfig
 
 class TestScreenerEngine:
@@ -12,7 +15,7 @@ class TestScreenerEngine:
         self.mock_config.min_data_points = 20
         self.engine = ScreenerEngine(self.mock_config)
     
-    @patch('screener_engine.ScreenerEngine.safe_download')
+    @patch('screener_engine.ScreenerEngine.safe_download_multiple')
     def test_should_screen_stocks_successfully(self, mock_download):
         # Given
         stock_data = pd.Series([100, 101, 102, 99, 103] * 10, 
@@ -20,7 +23,7 @@ class TestScreenerEngine:
         benchmark_data = pd.Series([100, 100.5, 101, 100.2, 101.5] * 10,
                                   index=pd.date_range('2024-01-01', periods=50))
         
-        mock_download.side_effect = [benchmark_data, stock_data]
+        mock_download.return_value = {'SPY': benchmark_data, 'AAPL': stock_data}
         
         # When
         results = self.engine.screen_stocks(['AAPL'], 'SPY', 30)
@@ -30,22 +33,35 @@ class TestScreenerEngine:
         assert 'AAPL' in results.index
         assert 'Information Ratio' in results.columns
     
-    @patch('screener_engine.ScreenerEngine.safe_download')
+    @patch('screener_engine.ScreenerEngine.safe_download_multiple')
+    def test_should_fetch_benchmark_and_stocks_in_one_batch(self, mock_download):
+        # Given
+        mock_download.return_value = {}
+        
+        # When
+        with pytest.raises(ValueError):
+            self.engine.screen_stocks([' aapl', 'MSFT'], 'SPY', 30)
+        
+        # Then
+        mock_download.assert_called_once()
+        assert mock_download.call_args[0][0] == ['SPY', 'AAPL', 'MSFT']
+    
+    @patch('screener_engine.ScreenerEngine.safe_download_multiple')
     def test_should_handle_missing_benchmark_data(self, mock_download):
         # Given
-        mock_download.return_value = None
+        mock_download.return_value = {'SPY': None}
         
         # When/Then
         with pytest.raises(ValueError, match="Cannot fetch benchmark data"):
             self.engine.screen_stocks(['AAPL'], 'INVALID', 30)
     
-    @patch('screener_engine.ScreenerEngine.safe_download')
+    @patch('screener_engine.ScreenerEngine.safe_download_multiple')
     def test_should_skip_stocks_with_insufficient_data(self, mock_download):
         # Given
         benchmark_data = pd.Series([100] * 50, index=pd.date_range('2024-01-01', periods=50))
         insufficient_stock_data = pd.Series([100] * 10)  # Too little data
         
-        mock_download.side_effect = [benchmark_data, insufficient_stock_data]
+        mock_download.return_value = {'SPY': benchmark_data, 'AAPL': insufficient_stock_data}
         
         # When
         results = self.engine.screen_stocks(['AAPL'], 'SPY', 30)
@@ -53,6 +69,186 @@ class TestScreenerEngine:
         # Then
         assert results.empty
     
+    @patch('screener_engine.ScreenerEngine.safe_download_multiple')
+    def test_should_collect_per_ticker_warnings(self, mock_download):
+        # Given
+        benchmark_data = pd.Series([100] * 50, index=pd.date_range('2024-01-01', periods=50))
+        mock_download.return_value = {'SPY': benchmark_data, 'AAPL': pd.Series([100] * 10), 'MSFT': None}
+        
+        # When
+        self.engine.screen_stocks(['AAPL', 'MSFT'], 'SPY', 30)
+        
+        # Then
+        assert len(self.engine.warnings) == 2
+        assert self.engine.warnings[0].startswith("Validation failed for AAPL")
+        assert self.engine.warnings[1] == "No data available for MSFT"
+    
+    @patch('screener_engine.ScreenerEngine.safe_download_multiple')
+    def test_should_use_supplied_price_data_without_downloading(self, mock_download):
+        # Given
+        stock_data = pd.Series([100, 101, 102, 99, 103] * 10,
+                              index=pd.date_range('2024-01-01', periods=50))
+        benchmark_data = pd.Series([100, 100.5, 101, 100.2, 101.5] * 10,
+                                  index=pd.date_range('2024-01-01', periods=50))
+        
+        # When
+        results = self.engine.screen_stocks(['aapl'], 'SPY', 30, price_data={'SPY': benchmark_data, 'AAPL': stock_data})
+        
+        # Then
+        mock_download.assert_not_called()
+        assert list(results.index) == ['AAPL']
+    
+    def test_should_keep_only_top_k_tickers_by_information_ratio(self):
+        # Given
+        rng = np.random.default_rng(21)
+        index = pd.date_range('2024-01-01', periods=50)
+        benchmark_data = pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.01, 50)), index=index)
+        price_data = {'SPY': benchmark_data}
+        for i in range(8):
+            price_data[f'T{i}'] = pd.Series(100 * np.cumprod(1 + rng.normal(0.001 * i, 0.02, 50)), index=index)
+        tickers = [f'T{i}' for i in range(8)]
+        
+        # When
+        full = self.engine.screen_stocks(tickers, 'SPY', 30, price_data=price_data)
+        top = self.engine.screen_stocks(tickers, 'SPY', 30, price_data=price_data, top_k=3)
+        
+        # Then
+        assert list(top.index) == list(full.index[:3])
+        pd.testing.assert_frame_equal(top, full.iloc[:3])
+    
+    @patch('screener_engine.ScreenerEngine.safe_download_multiple')
+    def test_should_use_parallel_processor_for_large_universes(self, mock_download):
+        # Given
+        stock_data = pd.Series([100, 101, 102, 99, 103] * 10,
+                              index=pd.date_range('2024-01-01', periods=50))
+        benchmark_data = pd.Series([100, 100.5, 101, 100.2, 101.5] * 10,
+                                  index=pd.date_range('2024-01-01', periods=50))
+        mock_download.return_value = {'SPY': benchmark_data, 'AAPL': stock_data}
+        self.engine.PARALLEL_MIN_TICKERS = 1
+        self.engine.parallel_processor = Mock()
+        self.engine.parallel_processor.parallel_metric_calculation.return_value = {'AAPL': {'Information Ratio': 0.5}}
+        
+        # When
+        results = self.engine.screen_stocks(['AAPL'], 'SPY', 30)
+        
+        # Then
+        self.engine.parallel_processor.parallel_metric_calculation.assert_called_once()
+        assert results.loc['AAPL', 'Information Ratio'] == 0.5
+    
+    def test_should_give_same_metrics_for_gaps_regardless_of_universe_size(self):
+        # Given
+        dates = pd.date_range('2024-01-01', periods=50)
+        benchmark_data = pd.Series(100 + np.cumsum(np.cos(np.arange(50)) * 0.5), index=dates)
+        complete = pd.Series(100 + np.cumsum(np.sin(np.arange(50))), index=dates)
+        stock_data_dict = {'FULL': complete, 'GAP': complete.drop(dates[45])}
+        self.engine.metrics_engine.calculators['Sharpe Ratio'].risk_free_rate = 0.20 / 252
+        
+        # When
+        serial = self.engine._calculate_metrics_for(stock_data_dict, benchmark_data, 30)
+        self.engine.PARALLEL_MIN_TICKERS = 1
+        parallel = self.engine._calculate_metrics_for(stock_data_dict, benchmark_data, 30)
+        
+        # Then
+        for ticker in stock_data_dict:
+            for name, value in serial[ticker].items():
+                assert parallel[ticker][name] == pytest.approx(value, nan_ok=True)
+    
+    def test_should_batch_complete_tickers_and_fall_back_for_gaps(self):
+        # Given
+        dates = pd.date_range('2024-01-01', periods=50)
+        benchmark_data = pd.Series(100 + np.cumsum(np.cos(np.arange(50)) * 0.5), index=dates)
+        complete = pd.Series(100 + np.cumsum(np.sin(np.arange(50))), index=dates)
+        gappy = complete.drop(dates[45])
+        
+        # When
+        with patch.object(self.engine, 'calculate_metrics', wraps=self.engine.calculate_metrics) as per_ticker:
+            metrics = self.engine._calculate_metrics_for({'FULL': complete, 'GAP': gappy}, benchmark_data, 30)
+        
+        # Then
+        per_ticker.assert_called_once_with(gappy, benchmark_data, 30, benchmark_returns=ANY)
+        expected = self.engine.calculate_metrics(complete, benchmark_data, 30)
+        for name, value in expected.items():
+            assert metrics['FULL'][name] == pytest.approx(value)
+        assert metrics['GAP'] is not None
+    
+    def test_should_screen_with_concurrently_fetched_prices(self):
+        # Given
+        stock_data = pd.Series([100, 101, 102, 99, 103] * 10,
+                              index=pd.date_range('2024-01-01', periods=50))
+        benchmark_data = pd.Series([100, 100.5, 101, 100.2, 101.5] * 10,
+                                  index=pd.date_range('2024-01-01', periods=50))
+        self.engine.async_fetcher.download_multiple_stocks = AsyncMock(
+            return_value={'SPY': benchmark_data, 'AAPL': stock_data, 'NOPE': ValueError("boom")}
+        )
+        
+        # When
+        results = asyncio.run(self.engine.screen_stocks_async(['aapl', 'NOPE'], 'SPY', 30))
+        
+        # Then
+        assert self.engine.async_fetcher.download_multiple_stocks.call_args[0][0] == ['SPY', 'AAPL', 'NOPE']
+        assert list(results.index) == ['AAPL']
+        assert self.engine.warnings == ["No data available for NOPE"]
+    
+    def test_should_use_each_engines_own_metric_settings(self):
+        # Given
+        dates = pd.date_range('2024-01-01', periods=50)
+        benchmark_data = pd.Series(100 + np.cumsum(np.cos(np.arange(50)) * 0.5), index=dates)
+        stock_data = pd.Series(100 + np.cumsum(np.sin(np.arange(50))), index=dates)
+        other = ScreenerEngine(self.mock_config)
+        other.metrics_engine = MetricsEngine(risk_free_rate=0.20)
+        
+        # When
+        default = self.engine._calculate_metrics_for({'AAPL': stock_data}, benchmark_data, 30)
+        custom = other._calculate_metrics_for({'AAPL': stock_data}, benchmark_data, 30)
+        other.PARALLEL_MIN_TICKERS = 1
+        custom_parallel = other._calculate_metrics_for({'AAPL': stock_data}, benchmark_data, 30)
+        
+        # Then
+        assert custom['AAPL']['Sharpe Ratio'] < default['AAPL']['Sharpe Ratio']
+        assert custom_parallel['AAPL']['Sharpe Ratio'] == pytest.approx(custom['AAPL']['Sharpe Ratio'])
+    
+    @patch('screener_engine.ScreenerEngine.safe_download_multiple')
+    def test_should_keep_warnings_in_input_order(self, mock_download):
+        # Given
+        benchmark_data = pd.Series([100] * 50, index=pd.date_range('2024-01-01', periods=50))
+        tickers = [f'T{i}' for i in range(8)]
+        mock_download.return_value = {'SPY': benchmark_data}
+        
+        # When
+        self.engine.screen_stocks(tickers, 'SPY', 30)
+        
+        # Then
+        assert self.engine.warnings == [f"No data available for {ticker}" for ticker in tickers]
+    
+    def test_should_compute_several_lookbacks_from_one_returns_matrix(self):
+        # Given
+        dates = pd.date_range('2024-01-01', periods=80)
+        benchmark_data = pd.Series(100 + np.cumsum(np.cos(np.arange(80)) * 0.5), index=dates)
+        stock_data_dict = {
+            'AAPL': pd.Series(100 + np.cumsum(np.sin(np.arange(80))), index=dates),
+            'MSFT': pd.Series(200 + np.cumsum(np.sin(np.arange(80) * 0.7)), index=dates),
+        }
+        
+        # When
+        with patch('screener_engine.window_returns', wraps=window_returns) as build:
+            results = self.engine.calculate_metrics_for_lookbacks(stock_data_dict, benchmark_data, [20, 40, 60])
+        
+        # Then
+        build.assert_called_once()
+        for lookback in (20, 40, 60):
+            for ticker, stock_data in stock_data_dict.items():
+                expected = self.engine.calculate_metrics(stock_data, benchmark_data, lookback)
+                for name, value in expected.items():
+                    assert results[lookback][ticker][name] == pytest.approx(value)
+    
+    def test_should_use_day_granularity_date_range(self):
+        # When
+        start_date, end_date = self.engine.date_range(60)
+        
+        # Then
+        assert type(start_date) is date and type(end_date) is date
+        assert (end_date - start_date).days == 60 + 100
+    
     def test_should_calculate_metrics_with_sufficient_data(self):
         # Given
         stock_data = pd.Series([100, 101, 102, 99, 103] * 10,
@@ -69,6 +265,50 @@ class TestScreenerEngine:
         assert 'Sharpe Ratio' in metrics
         assert 'Beta' in metrics
     
+    def test_should_give_same_metrics_for_aligned_and_misaligned_calendars(self):
+        # Given
+        dates = pd.date_range('2024-01-01', periods=50)
+        stock_data = pd.Series(100 + np.cumsum(np.sin(np.arange(50))), index=dates)
+        benchmark_data = pd.Series(100 + np.cumsum(np.cos(np.arange(50)) * 0.5), index=dates)
+        shifted_benchmark = benchmark_data.reindex(pd.date_range('2023-12-25', periods=60)).ffill().bfill()
+        
+        # When
+        aligned = self.engine.calculate_metrics(stock_data, benchmark_data, 30)
+        joined = self.engine.calculate_metrics(stock_data, shifted_benchmark, 30)
+        
+        # Then
+        for metric in ('Information Ratio', 'Beta', 'Alpha'):
+            assert aligned[metric] == pytest.approx(joined[metric])
+    
+    def test_should_compute_benchmark_returns_once_per_run(self):
+        # Given
+        index = pd.date_range('2024-01-01', periods=50)
+        benchmark_data = pd.Series(np.linspace(100, 110, 50), index=index)
+        stocks = {f'G{i}': pd.Series(np.linspace(50, 50 + i, 50), index=index).drop(index[45]) for i in range(1, 4)}
+        
+        # When
+        with patch.object(ScreenerEngine, '_simple_returns', wraps=ScreenerEngine._simple_returns) as returns:
+            self.engine._calculate_metrics_for(stocks, benchmark_data, 30)
+        
+        # Then
+        # One call per gapped stock, plus one for the benchmark
+        assert returns.call_count == len(stocks) + 1
+    
+    def test_should_see_benchmark_changed_in_place_between_runs(self):
+        # Given
+        index = pd.date_range('2024-01-01', periods=50)
+        benchmark_data = pd.Series(100 + np.cumsum(np.cos(np.arange(50)) * 0.5), index=index)
+        stocks = {'GAP': pd.Series(100 + np.cumsum(np.sin(np.arange(50))), index=index).drop(index[45])}
+        self.engine._calculate_metrics_for(stocks, benchmark_data, 30)
+        
+        # When
+        benchmark_data.iloc[-5:] *= 1.1
+        reused = self.engine._calculate_metrics_for(stocks, benchmark_data, 30)
+        fresh = ScreenerEngine(self.mock_config)._calculate_metrics_for(stocks, benchmark_data, 30)
+        
+        # Then
+        assert reused['GAP']['Beta'] == pytest.approx(fresh['GAP']['Beta'])
+    
     def test_should_return_none_for_insufficient_aligned_data(self):
         # Given
         stock_data = pd.Series([100, 101], index=pd.date_range('2024-01-01', periods=2))
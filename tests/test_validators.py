@@ -1,7 +1,7 @@
 import pytest
 import pandas as pd
 import numpy as np
-from validators import DataValidator
+from validators import DataValidator, _scan_prices, _scan_prices_numpy
 
 class TestDataValidator:
     def setup_method(self):
@@ -51,6 +51,20 @@ class TestDataValidator:
         assert is_valid is True
         assert message == "Valid"
     
+    def test_should_validate_raw_price_arrays_like_series(self):
+        # Given
+        prices = np.array([100, 101, 102, 99, 103] * 5, dtype=float)
+        
+        # When
+        array_result = self.validator.validate_stock_data(prices, "AAPL")
+        short_result = self.validator.validate_stock_data(prices[:3], "AAPL")
+        empty_result = self.validator.validate_stock_data(np.array([]), "AAPL")
+        
+        # Then
+        assert array_result == self.validator.validate_stock_data(pd.Series(prices), "AAPL") == (True, "Valid")
+        assert short_result == (False, "Insufficient data points: 3")
+        assert empty_result == (False, "No data for AAPL")
+    
     def test_should_sanitize_ticker_symbols(self):
         # Given
         dirty_tickers = [" aapl ", "MSFT", "nvda ", " GOOGL"]
@@ -61,6 +75,16 @@ class TestDataValidator:
         # Then
         assert clean_tickers == ["AAPL", "MSFT", "NVDA", "GOOGL"]
     
+    def test_should_sanitize_ticker_list_keeping_symbol_punctuation(self):
+        # Given
+        dirty_tickers = [" brk-b", "^gspc", "eurusd=x ", "$AAPL", "bf.b"]
+        
+        # When
+        clean_tickers = self.validator.sanitize_tickers(dirty_tickers)
+        
+        # Then
+        assert clean_tickers == ["BRK-B", "^GSPC", "EURUSD=X", "AAPL", "BF.B"]
+    
     def test_should_detect_poor_data_quality(self):
         # Given
         bad_data = pd.Series([0, -1, 100, 101])  # Contains zero and negative
@@ -89,4 +113,31 @@ class TestDataValidator:
         anomalies = self.validator.detect_anomalies(flat_data)
         
         # Then
-        assert "Extended flat periods" in anomalies
\ No newline at end of file
+        assert "Extended flat periods" in anomalies
+    
+    def test_should_skip_missing_prices_when_detecting_anomalies(self):
+        # Given
+        data = pd.Series([100, np.nan, 101, 102, np.nan, np.nan, 103] * 5)
+        
+        # When
+        anomalies = self.validator.detect_anomalies(data)
+        
+        # Then
+        assert anomalies == []
+    
+    def test_should_scan_prices_identically_with_and_without_numba(self):
+        # Given
+        rng = np.random.default_rng(5)
+        prices = rng.uniform(0.5, 2.0, 200)
+        prices[[3, 4, 50]] = np.nan
+        prices[10:14] = prices[9]
+        prices[80] = 0.0
+        prices[120] = -1.0
+        
+        # When
+        jit = _scan_prices(prices)
+        reference = _scan_prices_numpy(prices)
+        
+        # Then
+        assert jit == reference
+        assert _scan_prices(np.array([np.nan, np.nan])) == _scan_prices_numpy(np.array([np.nan, np.nan]))
@@ -1,93 +1,171 @@
-from typing import Tuple, List
+from typing import Tuple, List, Union
+import re
 import pandas as pd
 import numpy as np
 import logging
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - numba is an optional speedup
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Anything that cannot appear in a Yahoo symbol (e.g. BRK-B, ^GSPC, EURUSD=X)
+_TICKER_RE = re.compile(r'[^A-Z0-9.\-^=]')
+
+PriceData = Union[pd.Series, pd.DataFrame, np.ndarray]
+PriceScan = Tuple[int, float, int, int, int]
+
+def _scan_prices_numpy(prices: np.ndarray) -> PriceScan:
+    """(missing, min price, valid returns, extreme returns, flat steps) of a price array"""
+    n_nan = int(np.count_nonzero(np.isnan(prices)))
+    min_price = float(np.fmin.reduce(prices)) if n_nan < len(prices) else np.inf
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = prices[1:] / prices[:-1] - 1.0
+    n_returns = len(returns) - int(np.count_nonzero(np.isnan(returns)))
+    n_extreme = int(np.count_nonzero(np.abs(returns) > 0.5))
+    n_flat = int(np.count_nonzero(prices[1:] == prices[:-1]))
+    return n_nan, min_price, n_returns, n_extreme, n_flat
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, error_model='numpy')
+    def _scan_prices_jit(prices: np.ndarray) -> PriceScan:
+        """Single-pass equivalent of _scan_prices_numpy"""
+        n_nan = 0
+        min_price = np.inf
+        n_returns = 0
+        n_extreme = 0
+        n_flat = 0
+        for i in range(prices.shape[0]):
+            x = prices[i]
+            if np.isnan(x):
+                n_nan += 1
+            elif x < min_price:
+                min_price = x
+            if i > 0:
+                prev = prices[i - 1]
+                if x == prev:
+                    n_flat += 1
+                r = x / prev - 1.0
+                if not np.isnan(r):
+                    n_returns += 1
+                    if abs(r) > 0.5:
+                        n_extreme += 1
+        return n_nan, min_price, n_returns, n_extreme, n_flat
+
+    _scan_prices = _scan_prices_jit
+    # Compile (or load from the on-disk cache) once at import time
+    _scan_prices(np.zeros(2))
+else:
+    _scan_prices = _scan_prices_numpy
+
 class DataValidator:
     """Data validation as specified in docs/specification.md"""
     
-    def validate_stock_data(self, data: pd.Series, ticker: str) -> Tuple[bool, str]:
+    def validate_stock_data(self, data: PriceData, ticker: str) -> Tuple[bool, str]:
         """Comprehensive data validation"""
-        logger.debug(f"Validating data for {ticker}")
+        logger.debug("Validating data for %s", ticker)
         
         if data is None:
-            logger.debug(f"Data is None for {ticker}")
+            logger.debug("Data is None for %s", ticker)
             return False, f"No data for {ticker}"
         
-        # Ensure we have a Series - convert DataFrame to Series if needed
+        # Work on the raw values - take the first column of a DataFrame
         if isinstance(data, pd.DataFrame):
             if data.empty:
-                logger.debug(f"DataFrame is empty for {ticker}")
+                logger.debug("DataFrame is empty for %s", ticker)
                 return False, f"No data for {ticker}"
-            data = data.iloc[:, 0]  # Take first column
-        elif data.empty:
-            logger.debug(f"Data is empty for {ticker}")
-            return False, f"No data for {ticker}"
+            prices = data.iloc[:, 0].to_numpy(dtype=np.float64)
+        else:
+            prices = np.asarray(data, dtype=np.float64)
+            if len(prices) == 0:
+                logger.debug("Data is empty for %s", ticker)
+                return False, f"No data for {ticker}"
+        
+        n = len(prices)
+        logger.debug("Data length for %s: %d", ticker, n)
+        if n < 20:
+            logger.debug("Insufficient data points for %s: %d", ticker, n)
+            return False, f"Insufficient data points: {n}"
         
-        logger.debug(f"Data length for {ticker}: {len(data)}")
-        if len(data) < 20:
-            logger.debug(f"Insufficient data points for {ticker}: {len(data)}")
-            return False, f"Insufficient data points: {len(data)}"
+        # One scan of the prices feeds every remaining check
+        scan = _scan_prices(prices)
         
         # Check for excessive missing values
-        missing_count = int(data.isnull().sum())
-        missing_pct = missing_count / len(data)
-        logger.debug(f"Missing values for {ticker}: {missing_count}/{len(data)} ({missing_pct:.1%})")
+        missing_count = scan[0]
+        missing_pct = missing_count / n
+        logger.debug("Missing values for %s: %d/%d (%.1f%%)", ticker, missing_count, n, missing_pct * 100)
         
         if missing_pct > 0.1:
-            logger.debug(f"Too many missing values for {ticker}: {missing_pct:.1%}")
+            logger.debug("Too many missing values for %s: %.1f%%", ticker, missing_pct * 100)
             return False, f"Too many missing values: {missing_pct:.1%}"
         
         # Check data quality
-        logger.debug(f"Checking data quality for {ticker}")
-        if not self.check_data_quality(data):
-            logger.debug(f"Poor data quality detected for {ticker}")
+        logger.debug("Checking data quality for %s", ticker)
+        if not self._quality_ok(scan, n):
+            logger.debug("Poor data quality detected for %s", ticker)
             return False, "Poor data quality detected"
         
         # Check for anomalies
-        logger.debug(f"Detecting anomalies for {ticker}")
-        anomalies = self.detect_anomalies(data)
-        logger.debug(f"Anomalies detected for {ticker}: {anomalies}")
+        logger.debug("Detecting anomalies for %s", ticker)
+        anomalies = self._anomalies(scan, n)
+        logger.debug("Anomalies detected for %s: %s", ticker, anomalies)
         
         if len(anomalies) > 3:
-            logger.debug(f"Multiple anomalies detected for {ticker}: {anomalies}")
+            logger.debug("Multiple anomalies detected for %s: %s", ticker, anomalies)
             return False, f"Multiple anomalies detected: {', '.join(anomalies[:3])}"
         
-        logger.debug(f"Validation passed for {ticker}")
+        logger.debug("Validation passed for %s", ticker)
         return True, "Valid"
     
     def sanitize_ticker(self, ticker: str) -> str:
         """Clean and validate ticker symbols"""
-        return ticker.strip().upper().replace(" ", "")
+        return _TICKER_RE.sub('', ticker.upper())
+    
+    def sanitize_tickers(self, tickers: List[str]) -> List[str]:
+        """Clean a whole list of ticker symbols"""
+        sub = _TICKER_RE.sub
+        return [sub('', ticker.upper()) for ticker in tickers]
     
     def check_data_quality(self, data: pd.Series) -> bool:
         """Check overall data quality"""
+        prices = np.asarray(data, dtype=np.float64)
+        return self._quality_ok(_scan_prices(prices), len(prices))
+    
+    def detect_anomalies(self, data: pd.Series) -> List[str]:
+        """Detect data anomalies"""
+        prices = np.asarray(data, dtype=np.float64)
+        return self._anomalies(_scan_prices(prices), len(prices))
+    
+    @staticmethod
+    def _quality_ok(scan: PriceScan, n: int) -> bool:
+        """Quality verdict from a price scan"""
+        n_nan, min_price = scan[0], scan[1]
+        
         # Check if all values are null
-        if data.isnull().all():
+        if n_nan == n:
             return False
         
-        # Check for reasonable price ranges
-        if (data <= 0).any():
+        # Check for reasonable price ranges (missing values ignored)
+        if min_price <= 0:
             return False
         
         return True
     
-    def detect_anomalies(self, data: pd.Series) -> List[str]:
-        """Detect data anomalies"""
+    @staticmethod
+    def _anomalies(scan: PriceScan, n: int) -> List[str]:
+        """Anomaly list from a price scan"""
         anomalies = []
+        _, _, n_returns, n_extreme, n_flat = scan
         
-        # Check for extreme price movements
-        returns = data.pct_change().dropna()
-        if len(returns) > 0:
-            extreme_returns = (returns.abs() > 0.5).sum()
-            if extreme_returns > len(returns) * 0.01:
-                anomalies.append("Extreme price movements")
+        # Check for extreme price movements (NaN returns are skipped, as pct_change().dropna() did)
+        if n_returns > 0 and n_extreme > n_returns * 0.01:
+            anomalies.append("Extreme price movements")
         
         # Check for flat periods
-        flat_periods = (data.diff() == 0).sum()
-        if flat_periods > len(data) * 0.1:
+        if n_flat > n * 0.1:
             anomalies.append("Extended flat periods")
         
         return anomalies